@@ -1,7 +1,15 @@
+import logging
+import os
 import pygame
 import sys
-import math
-import random
+
+from bitboard import ROWS, COLS, CONNECT, Position
+from book import load_book
+from evaluation import evaluate_threats
+from positiondb import open_db
+from search import Search
+from stats import SearchStats
+from worker import Ponder, SearchWorker
 
 # Initialize Pygame
 pygame.init()
@@ -12,6 +20,17 @@ HEIGHT = 800
 SQUARE_SIZE = 100
 RADIUS = 45
 FPS = 60
+AI_DEPTH = 5
+# Think on the human's time in Human vs AI. Replies are searched no deeper
+# than PONDER_DEPTH, after which the ponder thread ends and the CPU idles.
+PONDER = True
+PONDER_DEPTH = AI_DEPTH + 2
+# Log the search statistics of every AI move (see stats.py) to stderr.
+LOG_STATS = False
+DROP_MS = 300
+SETTLE_MS = 100
+THINKING_REFRESH_MS = 100
+AI_DONE = pygame.USEREVENT + 1
 
 # Colors
 DARK_BLUE = (25, 42, 86)
@@ -28,220 +47,238 @@ pygame.display.set_caption("Connect 4 Ultimate")
 title_font = pygame.font.Font(None, 72)
 button_font = pygame.font.Font(None, 48)
 message_font = pygame.font.Font(None, 100)
+status_font = pygame.font.Font(None, 32)
 
 
-def create_board():
-    return [[None for _ in range(7)] for _ in range(6)]
+def create_board(rows=ROWS, cols=COLS):
+    return [[None for _ in range(cols)] for _ in range(rows)]
 
 
-def draw_board(board, current_col=None, is_human_turn=True, mode=2):
-    screen.fill(DARK_BLUE)
+BOARD_X = (WIDTH - 7 * SQUARE_SIZE) // 2
+BOARD_Y = 150
+STATUS_RECT = pygame.Rect(0, HEIGHT - 40, WIDTH, 40)
 
-    # Draw title
-    title_text = title_font.render("CONNECT 4", True, WHITE)
-    screen.blit(title_text, (WIDTH // 2 - title_text.get_width() // 2, 20))
-
-    # Draw game board
-    board_width = 7 * SQUARE_SIZE
-    board_height = 6 * SQUARE_SIZE
-    start_x = (WIDTH - board_width) // 2
-    start_y = 150
-
-    # Draw board background
-    pygame.draw.rect(screen, BOARD_BLUE,
-                     (start_x - 10, start_y - 10,
-                      board_width + 20, board_height + 20),
-                     border_radius=15)
-
-    # Draw column indicators
-    if current_col is not None and 0 <= current_col < 7:
-        if board[0][current_col] is None:
-            hover_color = YELLOW if is_human_turn else RED
-            hover_surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-            pygame.draw.circle(hover_surface, hover_color + (HOVER_ALPHA,),
-                               (SQUARE_SIZE // 2, SQUARE_SIZE // 2), RADIUS)
-            screen.blit(hover_surface, (start_x + current_col * SQUARE_SIZE, start_y - 80))
-
-    # Draw grid cells
-    for c in range(7):
-        for r in range(6):
-            x = start_x + c * SQUARE_SIZE
-            y = start_y + r * SQUARE_SIZE
-            pygame.draw.circle(screen, BLACK, (x + SQUARE_SIZE // 2, y + SQUARE_SIZE // 2), RADIUS + 3)
 
-            piece = board[r][c]
-            if piece == 'YELLOW':
-                pygame.draw.circle(screen, YELLOW, (x + SQUARE_SIZE // 2, y + SQUARE_SIZE // 2), RADIUS)
-            elif piece == 'RED':
-                pygame.draw.circle(screen, RED, (x + SQUARE_SIZE // 2, y + SQUARE_SIZE // 2), RADIUS)
+def cell_rect(r, c):
+    return pygame.Rect(BOARD_X + c * SQUARE_SIZE, BOARD_Y + r * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
 
-    pygame.display.update()
+
+def hover_rect(col):
+    return pygame.Rect(BOARD_X + col * SQUARE_SIZE, BOARD_Y - 80, SQUARE_SIZE, SQUARE_SIZE)
 
 
-def drop_animation(board, col, is_human):
-    start_x = (WIDTH - 7 * SQUARE_SIZE) // 2
-    start_y = 150
-    row = get_next_open_row(board, col)
+def piece_surface(color, alpha=255):
+    surface = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+    pygame.draw.circle(surface, color + (alpha,), (SQUARE_SIZE // 2, SQUARE_SIZE // 2), RADIUS)
+    return surface
 
-    for r in range(-1, row):
-        temp_y = start_y + r * SQUARE_SIZE
-        draw_temp_board = [row.copy() for row in board]
-        if r >= 0:
-            draw_temp_board[r][col] = 'YELLOW' if is_human else 'RED'
-        draw_board(draw_temp_board, None, is_human)
 
-        # Draw falling piece
-        if r < row:
-            color = YELLOW if is_human else RED
-            pygame.draw.circle(screen, color,
-                               (start_x + col * SQUARE_SIZE + SQUARE_SIZE // 2, temp_y + SQUARE_SIZE // 2), RADIUS)
+class BoardView:
+    # Keeps the static parts of the game screen (background, title, board
+    # frame and empty holes) in pre-rendered layers and remembers what
+    # is on screen, so each frame only recomposes and updates the
+    # rectangles whose contents changed.
+    def __init__(self):
+        self.static = pygame.Surface((WIDTH, HEIGHT))
+        self.static.fill(DARK_BLUE)
+        title_text = title_font.render("CONNECT 4", True, WHITE)
+        self.static.blit(title_text, (WIDTH // 2 - title_text.get_width() // 2, 20))
+        pygame.draw.rect(self.static, BOARD_BLUE,
+                         (BOARD_X - 10, BOARD_Y - 10, 7 * SQUARE_SIZE + 20, 6 * SQUARE_SIZE + 20),
+                         border_radius=15)
+
+        # The holes go over the hover indicator, so they get their own layer
+        self.holes = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        for c in range(7):
+            for r in range(6):
+                pygame.draw.circle(self.holes, BLACK, cell_rect(r, c).center, RADIUS + 3)
+
+        self.pieces = {'YELLOW': piece_surface(YELLOW), 'RED': piece_surface(RED)}
+        self.hovers = {True: piece_surface(YELLOW, HOVER_ALPHA), False: piece_surface(RED, HOVER_ALPHA)}
+        self.cells = [[None] * 7 for _ in range(6)]
+        self.hover = None
+        self.thinking = None
+        self.falling = None
+        self.dirty = []
+        self.full = True
+
+    def invalidate(self, rect=None):
+        # Something else drew over the screen: repaint `rect`, or all of it.
+        if rect is None:
+            self.full = True
+        else:
+            self.dirty.append(pygame.Rect(rect))
+
+    def compose(self, rect):
+        screen.set_clip(rect)
+        screen.blit(self.static, rect, rect)
+        if self.hover is not None:
+            col, is_human_turn = self.hover
+            screen.blit(self.hovers[is_human_turn], hover_rect(col))
+        screen.blit(self.holes, rect, rect)
+        for r in range(6):
+            for c in range(7):
+                piece = self.cells[r][c]
+                if piece is not None and rect.colliderect(cell_rect(r, c)):
+                    screen.blit(self.pieces[piece], cell_rect(r, c))
+        if self.falling is not None:
+            piece, x, y = self.falling
+            screen.blit(self.pieces[piece], (x, y))
+        if self.thinking is not None and rect.colliderect(STATUS_RECT):
+            draw_thinking(self.thinking / 200)
+        screen.set_clip(None)
+
+    def draw(self, board, current_col=None, is_human_turn=True, thinking=None, drop=None):
+        dirty, self.dirty = self.dirty, []
+
+        # A dropping piece is already on the board; its cell stays empty
+        # until the piece lands there.
+        hidden = None
+        falling = None
+        if drop is not None and not drop.landed():
+            hidden = (drop.row, drop.col)
+            rect = drop.update()
+            falling = (drop.piece, rect.x, rect.y)
+        if falling != self.falling:
+            if self.falling is not None:
+                dirty.append(pygame.Rect(self.falling[1], self.falling[2], SQUARE_SIZE, SQUARE_SIZE))
+            if falling is not None:
+                dirty.append(pygame.Rect(falling[1], falling[2], SQUARE_SIZE, SQUARE_SIZE))
+            self.falling = falling
 
-        pygame.display.update()
-        pygame.time.wait(50)
+        for r in range(6):
+            for c in range(7):
+                piece = None if (r, c) == hidden else board[r][c]
+                if piece != self.cells[r][c]:
+                    self.cells[r][c] = piece
+                    dirty.append(cell_rect(r, c))
+
+        hover = None
+        if current_col is not None and 0 <= current_col < 7 and board[0][current_col] is None:
+            hover = (current_col, is_human_turn)
+        if hover != self.hover:
+            if self.hover is not None:
+                dirty.append(hover_rect(self.hover[0]))
+            if hover is not None:
+                dirty.append(hover_rect(hover[0]))
+            self.hover = hover
+
+        thinking = None if thinking is None else int(thinking * 200)
+        if thinking != self.thinking:
+            self.thinking = thinking
+            dirty.append(STATUS_RECT)
+
+        if self.full:
+            self.full = False
+            dirty = [screen.get_rect()]
+        for rect in dirty:
+            self.compose(rect)
+        if dirty:
+            pygame.display.update(dirty)
+
+
+board_view = BoardView()
+
+
+def draw_board(board, current_col=None, is_human_turn=True, mode=2, thinking=None, drop=None):
+    board_view.draw(board, current_col, is_human_turn, thinking, drop)
+
+
+def draw_thinking(progress):
+    text = status_font.render("AI thinking...", True, WHITE)
+    bar = pygame.Rect(WIDTH // 2 - 100, HEIGHT - 28, 200, 14)
+    screen.blit(text, (bar.x - text.get_width() - 15, bar.centery - text.get_height() // 2))
+    pygame.draw.rect(screen, BOARD_BLUE, bar, border_radius=7)
+    pygame.draw.rect(screen, WHITE, (bar.x, bar.y, int(bar.width * progress), bar.height), border_radius=7)
+
+
+class DropAnimation:
+    # A piece falling into (row, col). Its height follows the time since the
+    # drop started, so every drop lasts DROP_MS at any frame rate; the
+    # move is finished SETTLE_MS after it lands.
+    def __init__(self, row, col, is_human):
+        self.row = row
+        self.col = col
+        self.piece = 'YELLOW' if is_human else 'RED'
+        self.is_human = is_human
+        self.start = pygame.time.get_ticks()
+        self.rect = hover_rect(col).move(0, 80 - SQUARE_SIZE)
+        self.top = self.rect.y
+        self.distance = cell_rect(row, col).y - self.top
+
+    def elapsed(self):
+        return pygame.time.get_ticks() - self.start
+
+    def landed(self):
+        return self.elapsed() >= DROP_MS
+
+    def done(self):
+        return self.elapsed() >= DROP_MS + SETTLE_MS
+
+    def update(self):
+        t = min(1.0, self.elapsed() / DROP_MS)
+        self.rect.y = self.top + int(self.distance * t * t)
+        return self.rect
 
 
 def get_next_open_row(board, col):
-    for r in reversed(range(6)):
+    for r in reversed(range(len(board))):
         if board[r][col] is None:
             return r
     return None
 
 
 def is_valid_move(board, col):
-    return 0 <= col < 7 and board[0][col] is None
+    return 0 <= col < len(board[0]) and board[0][col] is None
 
 
-def check_win(board, is_human):
+def check_win_at(board, row, col, is_human, connect=CONNECT):
+    # Only the four lines through the last dropped piece can have changed.
     piece = 'YELLOW' if is_human else 'RED'
-
-    # Horizontal
-    for r in range(6):
-        for c in range(4):
-            if all(board[r][c + i] == piece for i in range(4)):
-                return True
-
-    # Vertical
-    for c in range(7):
-        for r in range(3):
-            if all(board[r + i][c] == piece for i in range(4)):
-                return True
-
-    # Diagonals
-    for r in range(3):
-        for c in range(4):
-            if all(board[r + i][c + i] == piece for i in range(4)):
-                return True
-            if all(board[r + 3 - i][c + i] == piece for i in range(4)):
-                return True
+    rows, cols = len(board), len(board[0])
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for step in (1, -1):
+            r, c = row + dr * step, col + dc * step
+            while 0 <= r < rows and 0 <= c < cols and board[r][c] == piece:
+                count += 1
+                r += dr * step
+                c += dc * step
+        if count >= connect:
+            return True
     return False
 
 
-def evaluate_position(board):
-    score = 0
-
-    # Center control
-    center_array = [board[i][3] for i in range(6)]
-    score += center_array.count('RED') * 3
-
-    # Horizontal
-    for r in range(6):
-        row = board[r]
-        for c in range(4):
-            window = row[c:c + 4]
-            score += evaluate_window(window, 'RED', 'YELLOW')
-
-    # Vertical
-    for c in range(7):
-        col = [board[r][c] for r in range(6)]
-        for r in range(3):
-            window = col[r:r + 4]
-            score += evaluate_window(window, 'RED', 'YELLOW')
-
-    # Diagonals
-    for r in range(3):
-        for c in range(4):
-            window = [board[r + i][c + i] for i in range(4)]
-            score += evaluate_window(window, 'RED', 'YELLOW')
-    for r in range(3, 6):
-        for c in range(4):
-            window = [board[r - i][c + i] for i in range(4)]
-            score += evaluate_window(window, 'RED', 'YELLOW')
-
-    return score
-
-
-def evaluate_window(window, player, opponent):
-    score = 0
-    player_count = window.count(player)
-    opponent_count = window.count(opponent)
-    empty = window.count(None)
-
-    if player_count == 4:
-        score += 100
-    elif player_count == 3 and empty == 1:
-        score += 5
-    elif player_count == 2 and empty == 2:
-        score += 2
-
-    if opponent_count == 3 and empty == 1:
-        score -= 4
-
-    return score
-
-
-def minimax(board, depth, alpha, beta, maximizing):
-    valid_moves = [c for c in range(7) if is_valid_move(board, c)]
-    is_terminal = check_win(board, False) or check_win(board, True) or not valid_moves
-
-    if depth == 0 or is_terminal:
-        if check_win(board, False):
-            return (None, 100000000000000)
-        elif check_win(board, True):
-            return (None, -100000000000000)
-        else:
-            return (None, evaluate_position(board))
-
-    if maximizing:
-        value = -math.inf
-        column = random.choice(valid_moves)
-
-        for col in valid_moves:
-            row = get_next_open_row(board, col)
-            board_copy = [r.copy() for r in board]
-            board_copy[row][col] = 'RED'
-            new_score = minimax(board_copy, depth - 1, alpha, beta, False)[1]
-
-            if new_score > value:
-                value = new_score
-                column = col
-            alpha = max(alpha, value)
-            if alpha >= beta:
-                break
-        return column, value
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book_threats.bin')
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'positions.db')
+
+# The position database is opened by main(), so tools that import this
+# module do not write to it.
+engine = Search(evaluate_threats, 100000000000000, book=load_book(BOOK_PATH))
+
+
+def computer_move(board, depth=AI_DEPTH, movetime_ms=None):
+    pos = Position.from_board(board, 'RED', 'YELLOW')
+    if movetime_ms is not None:
+        col, _ = engine.iterative_deepening(pos, movetime_ms)
     else:
-        value = math.inf
-        column = random.choice(valid_moves)
-
-        for col in valid_moves:
-            row = get_next_open_row(board, col)
-            board_copy = [r.copy() for r in board]
-            board_copy[row][col] = 'YELLOW'
-            new_score = minimax(board_copy, depth - 1, alpha, beta, True)[1]
-
-            if new_score < value:
-                value = new_score
-                column = col
-            beta = min(beta, value)
-            if alpha >= beta:
-                break
-        return column, value
-
-
-def computer_move(board):
-    col, _ = minimax(board, 5, -math.inf, math.inf, True)
+        col, _ = engine.best_move(pos, depth)
     return col
 
 
+def wait_events(timeout=0):
+    # Sleeps until an event arrives (or `timeout` ms pass, if given) and
+    # returns every pending event.
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+
+def post_ai_done():
+    pygame.event.post(pygame.event.Event(AI_DONE))
+
+
 def show_message(text):
     overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
     pygame.draw.rect(overlay, (0, 0, 0, 200), (0, 0, WIDTH, HEIGHT))
@@ -254,15 +291,16 @@ def show_message(text):
     screen.blit(sub_text, (WIDTH // 2 - sub_text.get_width() // 2, HEIGHT // 2 + 50))
 
     pygame.display.update()
+    board_view.invalidate()
 
     waiting = True
     while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                waiting = False
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            waiting = False
 
 
 def game_mode_screen():
@@ -283,149 +321,193 @@ def game_mode_screen():
         screen.blit(text, (btn["rect"].x + 40, btn["rect"].y + 20))
 
     pygame.display.update()
+    board_view.invalidate()
 
     while True:
-        for event in pygame.event.get():
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            x, y = pygame.mouse.get_pos()
+            for btn in buttons:
+                if btn["rect"].collidepoint(x, y):
+                    if btn["mode"] == 3:
+                        pygame.quit()
+                        sys.exit()
+                    return btn["mode"]
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_1: return 1
+            if event.key == pygame.K_2: return 2
+            if event.key == pygame.K_ESCAPE: return 3
+
+
+MODE_SELECT = 'mode_select'
+PLAYING = 'playing'
+RESULT = 'result'
+
+
+class Session:
+    # The game flow as a state machine: MODE_SELECT -> PLAYING -> RESULT ->
+    # MODE_SELECT. Each game replaces the previous one's state instead of
+    # stacking on top of it, so memory stays flat however many games run.
+    def __init__(self):
+        self.state = MODE_SELECT
+        self.mode = None
+        self.board = None
+        self.human_turn = True
+        self.result = None
+        self.games = 0
+
+    def start(self, mode):
+        self.mode = mode
+        self.board = create_board()
+        self.human_turn = True
+        self.result = None
+        self.state = PLAYING
+
+    def drop(self, col):
+        # Puts the current player's piece in `col` and returns its row; the
+        # move takes effect once finish_move is called.
+        row = get_next_open_row(self.board, col)
+        self.board[row][col] = 'YELLOW' if self.human_turn else 'RED'
+        return row
+
+    def finish_move(self, row, col):
+        if check_win_at(self.board, row, col, self.human_turn):
+            if self.mode == 1:
+                self.result = "Yellow Player Wins!" if self.human_turn else "Red Player Wins!"
+            else:
+                self.result = "You Win!" if self.human_turn else "AI Wins!"
+            self.state = RESULT
+        elif all(all(cell is not None for cell in row) for row in self.board):
+            self.result = "Draw!"
+            self.state = RESULT
+        else:
+            self.human_turn = not self.human_turn
+
+    def acknowledge(self):
+        self.games += 1
+        self.board = None
+        self.state = MODE_SELECT
+
+
+def play(session):
+    board = session.board
+    mode = session.mode
+    current_col = None
+    human_col = None
+    drop = None
+    ai_pos = None
+    ai_search = None
+    ponder = None
+    predicted = None
+    clock = pygame.time.Clock()
+
+    while session.state == PLAYING:
+        # Run at FPS only while a piece is falling; otherwise sleep until
+        # an event arrives, waking up now and then to move the AI
+        # progress bar. The AI worker posts AI_DONE when it finishes.
+        if drop is not None:
+            clock.tick(FPS)
+            events = pygame.event.get()
+        elif mode == 2 and not session.human_turn and ai_search is None:
+            events = pygame.event.get()
+        elif ai_search is not None:
+            events = wait_events(THINKING_REFRESH_MS)
+        else:
+            events = wait_events()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                x, y = pygame.mouse.get_pos()
-                for btn in buttons:
-                    if btn["rect"].collidepoint(x, y):
-                        if btn["mode"] == 3:
-                            pygame.quit()
-                            sys.exit()
-                        return btn["mode"]
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1: return 1
-                if event.key == pygame.K_2: return 2
-                if event.key == pygame.K_ESCAPE: return 3
+
+            # In Human vs AI the mouse only counts on the human's turn
+            if mode == 2 and not session.human_turn:
+                continue
+
+            if event.type == pygame.MOUSEMOTION:
+                x = pygame.mouse.get_pos()[0]
+                board_start = (WIDTH - 7 * SQUARE_SIZE) // 2
+                current_col = (
+                                          x - board_start) // SQUARE_SIZE if board_start <= x < board_start + 7 * SQUARE_SIZE else None
+
+            if event.type == pygame.MOUSEBUTTONDOWN and current_col is not None and drop is None:
+                if is_valid_move(board, current_col):
+                    human_col = current_col
+
+                    # Place the piece and let it fall into view
+                    row = session.drop(current_col)
+                    drop = DropAnimation(row, current_col, session.human_turn)
+
+        if mode == 2:  # Human vs AI
+            # AI move handling: the search runs on a worker thread and the
+            # frame loop keeps going until its result is ready. A reply
+            # already pondered deep enough is played at once.
+            ai_move = None
+            if not session.human_turn and ai_search is None and drop is None:
+                ai_pos = Position.from_board(board, 'RED', 'YELLOW')
+                if ponder is not None:
+                    ponder.stop()
+                    ai_move = ponder.result(human_col, AI_DEPTH)
+                    ponder = None
+                    if ai_move is not None and engine.stats is not None:
+                        engine.stats.reset()
+                        engine.stats.lookup('ponder')
+                        engine.stats.log()
+                if ai_move is None:
+                    ai_search = SearchWorker(engine, ai_pos, depth=AI_DEPTH, on_done=post_ai_done)
+
+            if ai_search is not None and ai_search.ready():
+                ai_move = ai_search.wait()
+                ai_search = None
+                if engine.stats is not None:
+                    engine.stats.log()
+
+            if ai_move is not None:
+                col, _ = ai_move
+                pv = engine.principal_variation(ai_pos, col, AI_DEPTH) if col is not None else []
+                predicted = pv[1] if len(pv) > 1 else None
+
+                if col is not None and is_valid_move(board, col):
+                    row = session.drop(col)
+                    drop = DropAnimation(row, col, False)
+
+        # Finish a move once its piece has landed and settled
+        if drop is not None and drop.done():
+            row, col = drop.row, drop.col
+            drop = None
+            draw_board(board, None, session.human_turn, mode)
+            session.finish_move(row, col)
+
+        # Think about the AI's answers while the human decides
+        if (PONDER and mode == 2 and session.state == PLAYING and session.human_turn and ponder is None
+                and drop is None):
+            ponder = Ponder(engine, Position.from_board(board, 'YELLOW', 'RED'), predicted, PONDER_DEPTH)
+
+        thinking = ai_search.progress() if ai_search is not None else None
+        draw_board(board, None if drop else current_col, session.human_turn, mode, thinking, drop)
+
+    if ponder is not None:
+        ponder.stop()
 
 
 def main():
+    engine.db = open_db(DB_PATH, engine.evaluate, engine.win_score)
+    if LOG_STATS:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        engine.stats = SearchStats()
+    session = Session()
     while True:
-        board = create_board()
-        game_over = False
-        mode = game_mode_screen()
-
-        current_col = None
-        human_turn = True
-        clock = pygame.time.Clock()
-
-        while not game_over:
-            if mode == 1:  # Human vs Human
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-
-                    if event.type == pygame.MOUSEMOTION:
-                        x = pygame.mouse.get_pos()[0]
-                        board_start = (WIDTH - 7 * SQUARE_SIZE) // 2
-                        current_col = (
-                                                  x - board_start) // SQUARE_SIZE if board_start <= x < board_start + 7 * SQUARE_SIZE else None
-
-                    if event.type == pygame.MOUSEBUTTONDOWN and current_col is not None:
-                        if is_valid_move(board, current_col):
-                            # Play animation
-                            drop_animation(board, current_col, human_turn)
-
-                            # Update actual board state after animation
-                            row = get_next_open_row(board, current_col)
-                            board[row][current_col] = 'YELLOW' if human_turn else 'RED'
-
-                            # Show final board state
-                            draw_board(board, None, human_turn, mode)
-                            pygame.display.update()
-
-                            # Add slight delay before win check
-                            pygame.time.wait(100)
-
-                            if check_win(board, human_turn):
-                                winner = "Yellow Player Wins!" if human_turn else "Red Player Wins!"
-                                show_message(winner)
-                                game_over = True
-                            elif all(all(cell is not None for cell in row) for row in board):
-                                show_message("Draw!")
-                                game_over = True
-                            else:
-                                human_turn = not human_turn
-
-            elif mode == 2:  # Human vs AI
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-
-                    if human_turn:
-                        if event.type == pygame.MOUSEMOTION:
-                            x = pygame.mouse.get_pos()[0]
-                            board_start = (WIDTH - 7 * SQUARE_SIZE) // 2
-                            current_col = (
-                                                      x - board_start) // SQUARE_SIZE if board_start <= x < board_start + 7 * SQUARE_SIZE else None
-
-                        if event.type == pygame.MOUSEBUTTONDOWN and current_col is not None:
-                            if is_valid_move(board, current_col):
-                                # Human move animation
-                                drop_animation(board, current_col, True)
-
-                                # Update board after animation
-                                row = get_next_open_row(board, current_col)
-                                board[row][current_col] = 'YELLOW'
-
-                                # Show final state
-                                draw_board(board, None, False, mode)
-                                pygame.display.update()
-                                pygame.time.wait(100)
-
-                                if check_win(board, True):
-                                    show_message("You Win!")
-                                    game_over = True
-                                elif all(all(cell is not None for cell in row) for row in board):
-                                    show_message("Draw!")
-                                    game_over = True
-                                else:
-                                    human_turn = False  # Switch to AI turn
-
-                # AI move handling
-                if not human_turn and not game_over:
-                    # Show AI thinking
-                    draw_board(board, None, False, mode)
-                    pygame.display.update()
-                    pygame.time.wait(500)
-
-                    # Get AI move
-                    col = computer_move(board)
-
-                    if col is not None and is_valid_move(board, col):
-                        # AI move animation
-                        drop_animation(board, col, False)
-
-                        # Update board after animation
-                        row = get_next_open_row(board, col)
-                        board[row][col] = 'RED'
-
-                        # Show final state
-                        draw_board(board, None, True, mode)
-                        pygame.display.update()
-                        pygame.time.wait(100)
-
-                        if check_win(board, False):
-                            show_message("AI Wins!")
-                            game_over = True
-                        elif all(all(cell is not None for cell in row) for row in board):
-                            show_message("Draw!")
-                            game_over = True
-                        else:
-                            human_turn = True  # Switch back to human
-
-            draw_board(board, current_col, human_turn, mode)
-            clock.tick(FPS)
-
-        # Reset after game over
-        main()
+        if session.state == MODE_SELECT:
+            session.start(game_mode_screen())
+        elif session.state == PLAYING:
+            play(session)
+        else:
+            show_message(session.result)
+            session.acknowledge()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,16 @@
-import random
+import logging
+import os
 
+from bitboard import ROWS, COLS, CONNECT, Position
+from book import load_book
+from evaluation import evaluate_weighted
+from parallel import ParallelSearch
+from positiondb import open_db
+from search import Search
+from stats import SearchStats
 
-def create_board(rows=6, cols=7):
+
+def create_board(rows=ROWS, cols=COLS):
     return [[' ' for _ in range(cols)] for _ in range(rows)]
 
 
@@ -28,138 +37,63 @@ def get_next_open_row(board, col):
     return None
 
 
-def check_win(board, piece):
-    # Horizontal
-    for r in range(len(board)):
-        for c in range(len(board[0]) - 3):
-            if all(board[r][c + i] == piece for i in range(4)):
-                return True
-
-    # Vertical
-    for r in range(len(board) - 3):
-        for c in range(len(board[0])):
-            if all(board[r + i][c] == piece for i in range(4)):
-                return True
-
-    # Diagonal positive
-    for r in range(len(board) - 3):
-        for c in range(len(board[0]) - 3):
-            if all(board[r + i][c + i] == piece for i in range(4)):
-                return True
-
-    # Diagonal negative
-    for r in range(3, len(board)):
-        for c in range(len(board[0]) - 3):
-            if all(board[r - i][c + i] == piece for i in range(4)):
-                return True
+def check_win_at(board, row, col, piece, connect=CONNECT):
+    # Only the four lines through the last dropped piece can have changed.
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        count = 1
+        for step in (1, -1):
+            r, c = row + dr * step, col + dc * step
+            while 0 <= r < len(board) and 0 <= c < len(board[0]) and board[r][c] == piece:
+                count += 1
+                r += dr * step
+                c += dc * step
+        if count >= connect:
+            return True
     return False
 
 
-def evaluate_position(board, piece, opponent_piece):
-    score = 0
-    center = [row[len(board[0]) // 2] for row in board]
-    score += center.count(piece) * 3
-
-    # Horizontal
-    for r in range(len(board)):
-        row_arr = board[r]
-        for c in range(len(row_arr) - 3):
-            window = row_arr[c:c + 4]
-            score += window.count(piece) * 10
-            score -= window.count(opponent_piece) * 8
-
-    # Vertical
-    for c in range(len(board[0])):
-        col = [board[r][c] for r in range(len(board))]
-        for r in range(len(col) - 3):
-            window = col[r:r + 4]
-            score += window.count(piece) * 10
-            score -= window.count(opponent_piece) * 8
-
-    # Diagonal positive
-    for r in range(len(board) - 3):
-        for c in range(len(board[0]) - 3):
-            window = [board[r + i][c + i] for i in range(4)]
-            score += window.count(piece) * 10
-            score -= window.count(opponent_piece) * 8
-
-    # Diagonal negative
-    for r in range(3, len(board)):
-        for c in range(len(board[0]) - 3):
-            window = [board[r - i][c + i] for i in range(4)]
-            score += window.count(piece) * 10
-            score -= window.count(opponent_piece) * 8
-
-    return score
-
-
-def computer_move(board, computer_piece, human_piece, depth=4):
-    def minimax(temp_board, depth, alpha, beta, maximizing_player):
-        valid_moves = [c for c in range(7) if is_valid_column(temp_board, c)]
-
-        terminal = check_win(temp_board, computer_piece) or check_win(temp_board, human_piece)
-        if depth == 0 or terminal or not valid_moves:
-            if terminal:
-                if check_win(temp_board, computer_piece):
-                    return (None, 100000000)
-                elif check_win(temp_board, human_piece):
-                    return (None, -100000000)
-                else:  # Game over
-                    return (None, 0)
-            else:  # Depth zero
-                return (None, evaluate_position(temp_board, computer_piece, human_piece))
-
-        if maximizing_player:
-            value = -float('inf')
-            column = random.choice(valid_moves)
-            for col in valid_moves:
-                row = get_next_open_row(temp_board, col)
-                if row is None:
-                    continue
-                b_copy = [r.copy() for r in temp_board]
-                drop_piece(b_copy, row, col, computer_piece)
-                new_score = minimax(b_copy, depth - 1, alpha, beta, False)[1]
-                if new_score > value:
-                    value = new_score
-                    column = col
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return column, value
-
-        else:  # Minimizing player
-            value = float('inf')
-            column = random.choice(valid_moves)
-            for col in valid_moves:
-                row = get_next_open_row(temp_board, col)
-                if row is None:
-                    continue
-                b_copy = [r.copy() for r in temp_board]
-                drop_piece(b_copy, row, col, human_piece)
-                new_score = minimax(b_copy, depth - 1, alpha, beta, True)[1]
-                if new_score < value:
-                    value = new_score
-                    column = col
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return column, value
-
-    valid_moves = [c for c in range(7) if is_valid_column(board, c)]
-    if not valid_moves:
-        return None
-    best_col, _ = minimax(board, depth, -float('inf'), float('inf'), True)
-    return best_col if best_col is not None else random.choice(valid_moves)
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book_weighted.bin')
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'positions.db')
+# Log the search statistics of every computer move (see stats.py) to
+# stderr. Moves searched by the process pool in mode 3 are not counted.
+LOG_STATS = False
+
+# The position database is opened by play_game(), so tools that import
+# this module do not write to it.
+engine = Search(evaluate_weighted, 100000000, book=load_book(BOOK_PATH))
+parallel_engines = {}
+
+
+def computer_move(board, computer_piece, human_piece, depth=4, movetime_ms=None, workers=None):
+    pos = Position.from_board(board, computer_piece, human_piece)
+    if workers:
+        if workers not in parallel_engines:
+            parallel_engines[workers] = ParallelSearch(evaluate_weighted, 100000000, workers, engine.book,
+                                                        db=engine.db)
+        best_col, _ = parallel_engines[workers].best_move(pos, depth)
+    elif movetime_ms is not None:
+        best_col, _ = engine.iterative_deepening(pos, movetime_ms)
+    else:
+        best_col, _ = engine.best_move(pos, depth)
+    if not workers and engine.stats is not None:
+        engine.stats.log()
+    return best_col
 
 
 def play_game():
+    engine.db = open_db(DB_PATH, engine.evaluate, engine.win_score)
+    if LOG_STATS:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        engine.stats = SearchStats()
     board = create_board()
+    cols = len(board[0])
     game_over = False
 
     print("Choose game mode:")
     print("1. Human vs Computer")
     print("2. Human vs Human")
-    mode = input("Enter choice (1/2): ").strip()
+    print("3. Human vs Computer (max)")
+    mode = input("Enter choice (1/2/3): ").strip()
 
     human = 'X'
     computer = 'O'
@@ -168,21 +102,24 @@ def play_game():
     while not game_over:
         print_board(board)
 
-        if mode == '1' and current_player == computer:
+        if mode in ('1', '3') and current_player == computer:
             print("Computer's turn...")
-            col = computer_move(board, computer, human)
+            if mode == '3':
+                col = computer_move(board, computer, human, depth=11, workers=os.cpu_count())
+            else:
+                col = computer_move(board, computer, human)
             if col is None:
                 print("No valid moves left!")
                 break
             print(f"Computer chose column {col}")
         else:
             try:
-                col = int(input(f"Player {current_player} (0-6): "))
+                col = int(input(f"Player {current_player} (0-{cols - 1}): "))
             except ValueError:
-                print("Invalid input! Enter a number 0-6")
+                print(f"Invalid input! Enter a number 0-{cols - 1}")
                 continue
 
-        if 0 <= col < 7:
+        if 0 <= col < cols:
             if is_valid_column(board, col):
                 row = get_next_open_row(board, col)
                 if row is None:
@@ -190,9 +127,9 @@ def play_game():
                     continue
                 drop_piece(board, row, col, current_player)
 
-                if check_win(board, current_player):
+                if check_win_at(board, row, col, current_player):
                     print_board(board)
-                    if mode == '1' and current_player == computer:
+                    if mode in ('1', '3') and current_player == computer:
                         print("Computer wins!")
                     else:
                         print(f"Player {current_player} wins!")
@@ -0,0 +1,270 @@
+import argparse
+import importlib
+import importlib.util
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import ROWS, COLS, Position
+from evaluation import evaluate_threats
+from search import Search
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Engines are given as name[:depth] on the command line. Each entry loads
+# a move function taking (board, piece, opponent piece, depth) on a
+# create_board() grid of the scripts, plus its default depth.
+ENGINES = {}
+
+
+def engine(name, depth=None):
+    def register(load):
+        ENGINES[name] = (load, depth)
+        return load
+    return register
+
+
+def load_script(filename):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0].replace(' ', '_'),
+                                                  os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@engine('greedy')
+def _greedy():
+    module = load_script('connect 4 ai.py')
+
+    def move(board, piece, opponent, depth):
+        return module.computer_move(board, piece, opponent)
+    return move
+
+
+@engine('hardest', 4)
+def _hardest():
+    module = load_script('Connect 4 Hardest AI.py')
+
+    def move(board, piece, opponent, depth):
+        return module.computer_move(board, piece, opponent, depth)
+    # Like v2, searched without the opening book, so results do not depend
+    # on which book files happen to be on disk.
+    module.engine.book = None
+    move.search = module.engine
+    return move
+
+
+@engine('v2', 5)
+def _v2():
+    # The V2 UI's engine without loading pygame: same evaluation and win
+    # score as its computer_move.
+    search = Search(evaluate_threats, 100000000000000)
+
+    def move(board, piece, opponent, depth):
+        col, _ = search.best_move(Position.from_board(board, piece, opponent), depth)
+        return col
+    move.search = search
+    return move
+
+
+@engine('mcts', 200)
+def _mcts():
+    # The number after the name is the tree iteration budget.
+    module = importlib.import_module('mcts')
+
+    def move(board, piece, opponent, iterations):
+        # Drawn from the game's seeded `random`, so a game replays exactly.
+        return module.computer_move(board, piece, opponent, iterations, seed=random.getrandbits(64))
+    return move
+
+
+def parse_engine(spec):
+    name, _, depth = spec.partition(':')
+    if name not in ENGINES:
+        raise argparse.ArgumentTypeError(f"unknown engine {name!r}, choose from {', '.join(sorted(ENGINES))}")
+    return name, int(depth) if depth else ENGINES[name][1]
+
+
+def label(player):
+    name, depth = player
+    return name if depth is None else f"{name}:{depth}"
+
+
+def openings(plies, rows=ROWS, cols=COLS):
+    # Every move sequence of `plies` moves that does not end the game.
+    lines = []
+    pos = Position(rows, cols)
+
+    def visit(line):
+        if len(line) == plies:
+            lines.append(tuple(line))
+            return
+        for col in pos.valid_moves():
+            if pos.is_winning_move(col):
+                continue
+            pos.play(col)
+            visit(line + [col])
+            pos.unplay(col)
+
+    visit([])
+    return lines
+
+
+_moves = {}
+
+
+def _move_function(name):
+    if name not in _moves:
+        _moves[name] = ENGINES[name][0]()
+    return _moves[name]
+
+
+def play_game(first, second, opening, seed, rows=ROWS, cols=COLS):
+    # Plays `opening`, then lets the engines alternate with `first` on move
+    # after an even number of plies. Returns (score of `first`: 1, 0.5 or
+    # 0, {player index: [seconds thinking, moves]}). Every random choice of
+    # the engines comes from `seed`, whichever process plays the game.
+    random.seed(seed)
+    players = [first, second]
+    moves = [_move_function(name) for name, _ in players]
+    for move in moves:
+        search = getattr(move, 'search', None)
+        if search is not None:
+            search.tt.clear()
+
+    pieces = ['X', 'O']
+    board = [[' ' for _ in range(cols)] for _ in range(rows)]
+    pos = Position(rows, cols)
+    clock = {0: [0.0, 0], 1: [0.0, 0]}
+    ply = 0
+    while True:
+        side = ply % 2
+        if ply < len(opening):
+            col = opening[ply]
+        else:
+            start = time.perf_counter()
+            col = moves[side](board, pieces[side], pieces[side ^ 1], players[side][1])
+            clock[side][0] += time.perf_counter() - start
+            clock[side][1] += 1
+        if col is None or not pos.can_play(col):
+            # An illegal move loses the game.
+            return (0.0 if side == 0 else 1.0), clock
+        won = pos.is_winning_move(col)
+        board[rows - 1 - (pos.height[col] - col * pos.h1)][col] = pieces[side]
+        pos.play(col)
+        ply += 1
+        if won:
+            return (1.0 if side == 0 else 0.0), clock
+        if pos.is_full():
+            return 0.5, clock
+
+
+def elo(score, z=1.96):
+    # Elo difference for a mean score, with the Wilson interval of the
+    # score. A clean sweep has no finite estimate: it comes out infinite,
+    # and so does the open end of its interval.
+    def diff(p):
+        if p <= 0 or p >= 1:
+            return math.copysign(math.inf, p - 0.5)
+        return -400 * math.log10(1 / p - 1) + 0.0
+    low, high = score.interval(z)
+    return diff(score.mean), diff(low), diff(high)
+
+
+class Score:
+    # Running win/draw/loss tally of one engine against another.
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, result):
+        if result == 1:
+            self.wins += 1
+        elif result == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def mean(self):
+        return (self.wins + 0.5 * self.draws) / self.games
+
+    def interval(self, z=1.96):
+        # Wilson score interval of the mean score. Unlike mean +- z standard
+        # errors it stays inside [0, 1] and does not collapse to a point
+        # when every game ends the same way. Draws count as half a win,
+        # which only makes it wider.
+        n, p = self.games, self.mean
+        d = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / d
+        half = z / d * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+        return max(0.0, center - half), min(1.0, center + half)
+
+
+def run(players, plies=2, workers=None, seed=1):
+    # Round robin: every pair plays every opening twice, once from each
+    # side. Returns ({(a, b): Score of a against b}, {player: [seconds,
+    # moves]}).
+    games = []
+    for a, b in itertools.combinations(players, 2):
+        for opening in openings(plies):
+            games.append((a, b, opening))
+            games.append((b, a, opening))
+
+    scores = {pair: Score() for pair in itertools.combinations(players, 2)}
+    clocks = {player: [0.0, 0] for player in players}
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_game, first, second, opening, f"{seed}/{game}")
+                   for game, (first, second, opening) in enumerate(games)]
+        for (first, second, _), future in zip(games, futures):
+            result, clock = future.result()
+            if (first, second) in scores:
+                scores[first, second].add(result)
+            else:
+                scores[second, first].add(1 - result)
+            for side, player in enumerate((first, second)):
+                clocks[player][0] += clock[side][0]
+                clocks[player][1] += clock[side][1]
+    return scores, clocks
+
+
+def report(scores, clocks):
+    print(f"{'pairing':<24} {'games':>5} {'W':>4} {'D':>4} {'L':>4} {'elo':>7}  95% interval")
+    for (a, b), score in scores.items():
+        diff, low, high = elo(score)
+        if math.isinf(diff):
+            # A sweep only bounds the difference from one side.
+            estimate = f">{low:+.0f}" if diff > 0 else f"<{high:+.0f}"
+        else:
+            estimate = f"{diff:+.0f}"
+        print(f"{label(a) + ' vs ' + label(b):<24} {score.games:>5} {score.wins:>4} {score.draws:>4} "
+              f"{score.losses:>4} {estimate:>7}  [{low:+.0f}, {high:+.0f}]")
+    print()
+    print(f"{'engine':<12} {'moves':>7} {'ms/move':>9}")
+    for player, (seconds, moves) in clocks.items():
+        print(f"{label(player):<12} {moves:>7} {1000 * seconds / moves if moves else 0:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Connect 4 engines against each other and report Elo")
+    parser.add_argument('engines', nargs='*', type=parse_engine, default=None,
+                        help=f"name[:depth], from {', '.join(sorted(ENGINES))} (default: all)")
+    parser.add_argument('--plies', type=int, default=2, help="length of the opening lines played from")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    players = args.engines or [parse_engine(name) for name in ENGINES]
+    if len(set(players)) < 2:
+        parser.error("need at least two different engines")
+    start = time.perf_counter()
+    scores, clocks = run(list(dict.fromkeys(players)), args.plies, args.workers, args.seed)
+    report(scores, clocks)
+    print(f"\n{sum(s.games for s in scores.values())} games in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,131 @@
+import numpy as np
+
+from bitboard import ROWS, COLS, CONNECT
+from evaluation import evaluate_threats
+
+# Boards here are int8 arrays of shape (N, rows, cols) laid out like
+# create_board(): top row first, 0 for an empty cell and 1 or 2 for the
+# pieces of the two players.
+EMPTY = 0
+
+_windows = {}
+
+
+def windows(rows=ROWS, cols=COLS, connect=CONNECT):
+    # Flat cell indexes (row * cols + col) of every `connect`-cell window,
+    # shape (W, connect), and of the center column.
+    key = (rows, cols, connect)
+    if key not in _windows:
+        n = connect
+        lines = []
+        for r in range(rows):
+            for c in range(cols - n + 1):
+                lines.append([r * cols + c + i for i in range(n)])
+        for c in range(cols):
+            for r in range(rows - n + 1):
+                lines.append([(r + i) * cols + c for i in range(n)])
+        for r in range(rows - n + 1):
+            for c in range(cols - n + 1):
+                lines.append([(r + i) * cols + c + i for i in range(n)])
+        for r in range(n - 1, rows):
+            for c in range(cols - n + 1):
+                lines.append([(r - i) * cols + c + i for i in range(n)])
+        center = np.arange(rows) * cols + cols // 2
+        _windows[key] = (np.array(lines, dtype=np.intp), center)
+    return _windows[key]
+
+
+def from_positions(positions):
+    # Boards for a list of bitboard Positions, with 1 for the stones of the
+    # side to move in each one and 2 for the other side's.
+    rows, cols = positions[0].rows, positions[0].cols
+    h1 = rows + 1
+    if h1 * cols > 64:
+        return np.array([[[(pos.boards[pos.turn] >> (c * h1 + rows - 1 - r) & 1)
+                           + 2 * (pos.boards[pos.turn ^ 1] >> (c * h1 + rows - 1 - r) & 1)
+                           for c in range(cols)] for r in range(rows)] for pos in positions], dtype=np.int8)
+    shifts = np.array([[c * h1 + rows - 1 - r for c in range(cols)] for r in range(rows)], dtype=np.uint64)
+    stones = np.array([[pos.boards[pos.turn], pos.boards[pos.turn ^ 1]] for pos in positions], dtype=np.uint64)
+    cells = (stones[:, :, None, None] >> shifts) & np.uint64(1)
+    return (cells[:, 0] + 2 * cells[:, 1]).astype(np.int8)
+
+
+def from_grids(grids, piece, other):
+    # Boards for a list of create_board() grids, with 1 for `piece` and 2
+    # for `other`.
+    codes = {piece: 1, other: 2}
+    return np.array([[[codes.get(cell, EMPTY) for cell in row] for row in grid] for grid in grids], dtype=np.int8)
+
+
+def window_counts(boards, piece, connect=CONNECT):
+    # Number of `piece` stones in every window of every board, (N, W).
+    rows, cols = boards.shape[1:]
+    lines, _ = windows(rows, cols, connect)
+    flat = (boards.reshape(len(boards), -1) == piece).astype(np.int8)
+    return flat[:, lines].sum(axis=2, dtype=np.int8)
+
+
+def evaluate_batch(boards, player=1, evaluation=evaluate_threats, connect=CONNECT):
+    # Scores of `player` (1 or 2) on every board, the same as `evaluation`
+    # gives one Position at a time.
+    boards = np.asarray(boards, dtype=np.int8)
+    rows, cols = boards.shape[1:]
+    _, center = windows(rows, cols, connect)
+    scores = np.array(evaluation.scores(connect), dtype=np.int64)
+    mine = window_counts(boards, player, connect)
+    theirs = window_counts(boards, 3 - player, connect)
+    total = scores[mine, theirs].sum(axis=1)
+    flat = boards.reshape(len(boards), -1)
+    total += (flat[:, center] == player).sum(axis=1) * evaluation.center_weight
+    return total
+
+
+# Results of winners(), one per board.
+ONGOING = 0
+DRAW = 3
+BOTH = 4  # both players have four in a row: not a reachable position
+
+
+def _result(won1, won2, full):
+    result = np.full(len(won1), ONGOING, dtype=np.int8)
+    result[full] = DRAW
+    result[won1] = 1
+    result[won2] = 2
+    result[won1 & won2] = BOTH
+    return result
+
+
+def winners(boards, connect=CONNECT):
+    # 1 or 2 for the player with a line of `connect`, DRAW for a full
+    # board without one and ONGOING otherwise, for every board.
+    boards = np.asarray(boards, dtype=np.int8)
+    full = (boards != EMPTY).all(axis=(1, 2))
+    return _result((window_counts(boards, 1, connect) == connect).any(axis=1),
+                   (window_counts(boards, 2, connect) == connect).any(axis=1), full)
+
+
+def bitboard_dtype(rows, cols):
+    # uint64 while a bitboard fits in 64 bits; past that, arrays of Python
+    # ints, which are slower but have no width limit.
+    return np.uint64 if (rows + 1) * cols <= 64 else object
+
+
+def aligned(stones, h1, connect=CONNECT):
+    # bitboard.aligned for an array of bitboards.
+    won = np.zeros(stones.shape, dtype=bool)
+    for shift in (h1, h1 + 1, h1 - 1, 1):
+        m = stones
+        for i in range(1, connect):
+            m = m & (stones >> i * shift)
+        won |= m != 0
+    return won
+
+
+def winners_bitboards(stones, rows=ROWS, cols=COLS, connect=CONNECT):
+    # winners() for bitboards: `stones` has shape (N, 2), player 1's and
+    # player 2's stones in the layout of bitboard.Position.
+    h1 = rows + 1
+    stones = np.asarray(stones, dtype=bitboard_dtype(rows, cols))
+    full = sum(((1 << rows) - 1) << (c * h1) for c in range(cols))
+    return _result(aligned(stones[:, 0], h1, connect), aligned(stones[:, 1], h1, connect),
+                   (stones[:, 0] | stones[:, 1]) == full)
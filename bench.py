@@ -0,0 +1,197 @@
+import argparse
+import json
+import platform
+import sys
+import time
+
+from bitboard import Position
+from book import ENGINES
+from mcts import MCTS
+from search import Search
+from solver import Solver
+from stats import SearchStats
+
+# Positions as the columns played from the empty board, the moves that
+# are best under perfect play and the exact solver score of the position
+# for the side to move (see solver.py). The empty board is from the
+# literature; the rest were solved with solver.py.
+CORPUS = [
+    ('empty', 'opening', '', [3], 1),
+    ('twelve-a', 'opening', '006433213213', [2], 1),
+    ('twelve-b', 'opening', '024033563333', [2, 5], 0),
+    ('twelve-c', 'midgame', '213533333222', [0, 1, 2, 5, 6], -3),
+    ('eighteen-a', 'midgame', '425236322333234444', [6], -1),
+    ('eighteen-b', 'midgame', '010233003333222244', [4, 5], 2),
+    ('twentysix-a', 'midgame', '40404443321003213212322131', [1, 5], 2),
+    ('twentysix-b', 'endgame', '35613333322222444544124611', [1], 0),
+    ('twentysix-c', 'endgame', '14414433203203212522113430', [0, 1, 4, 6], 2),
+    ('twentysix-d', 'endgame', '46433333444322122211115524', [1, 5, 6], -5),
+    ('twentysix-e', 'endgame', '11533333311122242245555215', [0, 4, 6], -2),
+    ('thirty', 'endgame', '325445036665461464130362421050', [1], 6),
+]
+
+DEPTHS = {'opening': 9, 'midgame': 9, 'endgame': 12}
+
+# Board sizes for --scaling, as (rows, cols, connect).
+GEOMETRIES = [(6, 7, 4), (7, 8, 4), (8, 9, 4), (9, 10, 4), (10, 12, 4)]
+
+
+def position(moves):
+    pos = Position()
+    for col in moves:
+        pos.play(int(col))
+    return pos
+
+
+def bench_search(engine, pos, depth):
+    # Deepens one ply at a time like iterative_deepening, but without a
+    # clock, and records time and nodes to reach every depth. The book and
+    # the endgame solver are off so only the search itself is measured.
+    evaluate, win_score = ENGINES[engine]
+    depths = []
+
+    def on_depth(record):
+        previous = depths[-1] if depths else {'seconds': 0.0, 'nodes': 0}
+        depths.append({'depth': record['depth'], 'seconds': previous['seconds'] + record['seconds'],
+                        'nodes': previous['nodes'] + sum(record['nodes'])})
+
+    stats = SearchStats(on_depth)
+    search = Search(evaluate, win_score, endgame_cells=0, stats=stats)
+    start = time.perf_counter()
+    pv = None
+    for d in range(1, depth + 1):
+        col, score = search.best_move(pos, d, pv)
+        pv = search.principal_variation(pos, col, d) if col is not None else []
+    report = stats.report()
+    return {'move': col, 'score': score, 'nodes': report['nodes'], 'seconds': time.perf_counter() - start,
+            'evaluations': report['evaluations'], 'first_move_cutoff_rate': report['first_move_cutoff_rate'],
+            'tt_hit_rate': report['tt_hit_rate'], 'depths': depths}
+
+
+def bench_solver(pos):
+    solver = Solver()
+    start = time.perf_counter()
+    col, score = solver.best_move(pos)
+    return {'move': col, 'score': score, 'nodes': solver.nodes, 'seconds': time.perf_counter() - start}
+
+
+def bench_mcts(pos, iterations=200):
+    mcts = MCTS(iterations, seed=1)
+    start = time.perf_counter()
+    col, score = mcts.best_move(pos)
+    return {'move': col, 'score': score, 'nodes': mcts.playouts, 'seconds': time.perf_counter() - start}
+
+
+def run(engines, depth=None, phases=None):
+    results = []
+    for name, phase, moves, best, score in CORPUS:
+        if phases and phase not in phases:
+            continue
+        pos = position(moves)
+        for engine in engines:
+            if engine == 'solver':
+                if phase != 'endgame':
+                    continue
+                result = bench_solver(pos.copy())
+                result['correct'] = result['move'] in best and result['score'] == score
+            elif engine == 'mcts':
+                result = bench_mcts(pos)
+                result['correct'] = result['move'] in best
+            else:
+                result = bench_search(engine, pos, depth or DEPTHS[phase])
+                result['correct'] = result['move'] in best
+            result.update(engine=engine, position=name, phase=phase)
+            result['nps'] = result['nodes'] / result['seconds'] if result['seconds'] else 0.0
+            results.append(result)
+    return results
+
+
+def scaling(engines, depth=7, geometries=GEOMETRIES):
+    # Search cost on the empty board as the board grows. The effective
+    # branching factor is the node count of the last iteration over that
+    # of the one before.
+    results = []
+    for rows, cols, connect in geometries:
+        for engine in engines:
+            if engine not in ENGINES:
+                continue
+            result = bench_search(engine, Position(rows, cols, connect), depth)
+            iterations = [0] + [d['nodes'] for d in result['depths']]
+            result.update(engine=engine, geometry=f"{rows}x{cols}/{connect}",
+                          branching=(iterations[-1] - iterations[-2]) / max(1, iterations[-2] - iterations[-3]))
+            result['nps'] = result['nodes'] / result['seconds'] if result['seconds'] else 0.0
+            results.append(result)
+    return results
+
+
+def report_scaling(results):
+    print(f"{'engine':<10} {'geometry':<10} {'depth':>5} {'move':>4} {'nodes':>10} {'seconds':>8} {'knps':>7} {'ebf':>6}")
+    for r in results:
+        print(f"{r['engine']:<10} {r['geometry']:<10} {r['depths'][-1]['depth']:>5} {r['move']:>4} {r['nodes']:>10} "
+              f"{r['seconds']:>8.3f} {r['nps'] / 1000:>7.1f} {r['branching']:>6.2f}")
+
+
+def summary(results):
+    totals = {}
+    for result in results:
+        total = totals.setdefault(result['engine'], {'positions': 0, 'correct': 0, 'nodes': 0, 'seconds': 0.0})
+        total['positions'] += 1
+        total['correct'] += result['correct']
+        total['nodes'] += result['nodes']
+        total['seconds'] += result['seconds']
+    for total in totals.values():
+        total['nps'] = total['nodes'] / total['seconds'] if total['seconds'] else 0.0
+    return totals
+
+
+def report(results, totals, baseline=None):
+    print(f"{'engine':<10} {'position':<12} {'phase':<8} {'move':>4} {'ok':>3} {'nodes':>10} {'seconds':>8} {'knps':>7}")
+    for r in results:
+        print(f"{r['engine']:<10} {r['position']:<12} {r['phase']:<8} {str(r['move']):>4} "
+              f"{'yes' if r['correct'] else 'no':>3} {r['nodes']:>10} {r['seconds']:>8.3f} {r['nps'] / 1000:>7.1f}")
+    print()
+    for engine, t in totals.items():
+        line = (f"{engine}: {t['correct']}/{t['positions']} correct, {t['nodes']} nodes, "
+                f"{t['seconds']:.2f}s, {t['nps'] / 1000:.1f} knps")
+        old = (baseline or {}).get(engine)
+        if old and t['seconds']:
+            line += f", {old['seconds'] / t['seconds']:.2f}x the speed of the baseline"
+            if old['nodes'] != t['nodes']:
+                line += f" (nodes {old['nodes']} -> {t['nodes']})"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Connect 4 engines on a fixed position corpus")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES) + ['mcts', 'solver'],
+                        default=sorted(ENGINES) + ['mcts', 'solver'])
+    parser.add_argument('--depth', type=int, default=None, help="fixed search depth instead of the per-phase default")
+    parser.add_argument('--phases', nargs='+', choices=sorted(DEPTHS))
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare against a JSON file written by an earlier run")
+    parser.add_argument('--scaling', action='store_true',
+                        help="search the empty board of every size from 6x7 to 10x12 instead of the corpus")
+    args = parser.parse_args()
+
+    if args.scaling:
+        results = scaling(args.engines, max(2, args.depth or 7))
+        report_scaling(results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'python': sys.version.split()[0], 'platform': platform.platform(),
+                           'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'depth': args.depth or 7,
+                           'scaling': results}, f, indent=2)
+        sys.exit()
+
+    results = run(args.engines, args.depth, args.phases)
+    totals = summary(results)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['totals']
+    report(results, totals, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'platform': platform.platform(),
+                       'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'depth': args.depth,
+                       'results': results, 'totals': totals}, f, indent=2)
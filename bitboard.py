@@ -0,0 +1,143 @@
+ROWS = 6
+COLS = 7
+CONNECT = 4
+
+
+class Position:
+    # Column c uses bits c * (rows + 1) .. c * (rows + 1) + rows - 1, bottom
+    # cell first. The extra bit on top of every column stays empty so that
+    # shifted masks never bleed from one column into the next. Python ints
+    # have no fixed width, so any board size works; `connect` stones in a
+    # line win.
+    def __init__(self, rows=ROWS, cols=COLS, connect=CONNECT):
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.h1 = rows + 1
+        self.boards = [0, 0]
+        # The same stones reflected left to right, kept up to date so that
+        # the mirror key costs no more than key().
+        self.mirror = [0, 0]
+        self.height = [c * self.h1 for c in range(cols)]
+        self.top = [c * self.h1 + rows for c in range(cols)]
+        self.mirror_shift = [(cols - 1 - 2 * c) * self.h1 for c in range(cols)]
+        self.turn = 0
+        self.moves = 0
+
+    @classmethod
+    def from_board(cls, board, current, other, connect=CONNECT):
+        # `board` is a create_board() grid, top row first; `current` is the
+        # piece of the side to move and becomes player 0.
+        rows, cols = len(board), len(board[0])
+        pos = cls(rows, cols, connect)
+        for c in range(cols):
+            for r in range(rows):
+                cell = board[rows - 1 - r][c]
+                if cell == current:
+                    player = 0
+                elif cell == other:
+                    player = 1
+                else:
+                    break
+                pos.boards[player] |= 1 << pos.height[c]
+                pos.mirror[player] |= 1 << (pos.height[c] + pos.mirror_shift[c])
+                pos.height[c] += 1
+                pos.moves += 1
+        return pos
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.rows = self.rows
+        pos.cols = self.cols
+        pos.connect = self.connect
+        pos.h1 = self.h1
+        pos.boards = self.boards[:]
+        pos.mirror = self.mirror[:]
+        pos.height = self.height[:]
+        pos.top = self.top
+        pos.mirror_shift = self.mirror_shift
+        pos.turn = self.turn
+        pos.moves = self.moves
+        return pos
+
+    @property
+    def mask(self):
+        return self.boards[0] | self.boards[1]
+
+    def can_play(self, col):
+        return self.height[col] < self.top[col]
+
+    def valid_moves(self):
+        return [c for c in range(self.cols) if self.height[c] < self.top[c]]
+
+    def play(self, col):
+        i = self.height[col]
+        self.boards[self.turn] |= 1 << i
+        self.mirror[self.turn] |= 1 << (i + self.mirror_shift[col])
+        self.height[col] = i + 1
+        self.turn ^= 1
+        self.moves += 1
+
+    def unplay(self, col):
+        # Takes back the last stone played in `col`.
+        self.turn ^= 1
+        self.moves -= 1
+        i = self.height[col] - 1
+        self.height[col] = i
+        self.boards[self.turn] ^= 1 << i
+        self.mirror[self.turn] ^= 1 << (i + self.mirror_shift[col])
+
+    def is_winning_move(self, col):
+        return aligned(self.boards[self.turn] | (1 << self.height[col]), self.h1, self.connect)
+
+    def is_full(self):
+        return self.moves == self.rows * self.cols
+
+    def key(self):
+        # Stones of the side to move plus the occupancy mask identify the
+        # position uniquely: every column's height shows up as a single
+        # carry bit above its stones.
+        return self.boards[self.turn] + (self.boards[0] | self.boards[1])
+
+    def mirror_key(self):
+        # key() of the position reflected left to right.
+        return self.mirror[self.turn] + (self.mirror[0] | self.mirror[1])
+
+    def canonical_key(self):
+        # One key for a position and its mirror image; the flag tells whether
+        # the mirror was used, so moves need remapping with cols - 1 - col.
+        key, mirrored = self.key(), self.mirror_key()
+        return (mirrored, True) if mirrored < key else (key, False)
+
+
+def aligned(b, h1, connect=CONNECT):
+    if connect != 4:
+        # `connect` stones in a row along any of the four directions.
+        for shift in (h1, h1 + 1, h1 - 1, 1):
+            m = b
+            for i in range(1, connect):
+                m &= b >> (i * shift)
+            if m:
+                return True
+        return False
+
+    # Horizontal
+    m = b & (b >> h1)
+    if m & (m >> 2 * h1):
+        return True
+
+    # Diagonal positive
+    m = b & (b >> (h1 + 1))
+    if m & (m >> 2 * (h1 + 1)):
+        return True
+
+    # Diagonal negative
+    m = b & (b >> (h1 - 1))
+    if m & (m >> 2 * (h1 - 1)):
+        return True
+
+    # Vertical
+    m = b & (b >> 1)
+    if m & (m >> 2):
+        return True
+    return False
@@ -0,0 +1,135 @@
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from bitboard import ROWS, COLS, CONNECT, Position
+from evaluation import evaluate_weighted, evaluate_threats
+from search import Search
+
+# File layout: a header followed by fixed-size records sorted by key. Keys
+# are canonical (mirror-folded) position keys with the side to move being
+# the book's engine; the score is from its point of view and the move is
+# given for the canonical orientation.
+MAGIC = b'C4BK'
+VERSION = 1
+HEADER = struct.Struct('<4sHBB8sQ')
+RECORD = struct.Struct('<QqB')
+
+ENGINES = {
+    'weighted': (evaluate_weighted, 100000000),
+    'threats': (evaluate_threats, 100000000000000),
+}
+
+
+def opening_positions(plies, rows=ROWS, cols=COLS):
+    # Every position reachable in at most `plies` moves with no winner yet,
+    # one per mirror pair.
+    positions = {}
+
+    def visit(pos):
+        key, _ = pos.canonical_key()
+        if key in positions:
+            return
+        positions[key] = pos.copy()
+        if pos.moves == plies:
+            return
+        for col in pos.valid_moves():
+            if pos.is_winning_move(col):
+                continue
+            pos.play(col)
+            visit(pos)
+            pos.unplay(col)
+
+    visit(Position(rows, cols))
+    return positions
+
+
+def build_book(path, plies=4, depth=10, engine='weighted', rows=ROWS, cols=COLS):
+    evaluate, win_score = ENGINES[engine]
+    search = Search(evaluate, win_score)
+    positions = opening_positions(plies, rows, cols)
+    records = []
+    start = time.perf_counter()
+    for i, (key, pos) in enumerate(sorted(positions.items())):
+        col, score = search.best_move(pos, depth)
+        if col is None:
+            continue
+        if pos.canonical_key()[1]:
+            col = cols - 1 - col
+        records.append((key, score, col))
+        if (i + 1) % 100 == 0:
+            print(f"{i + 1}/{len(positions)} positions, {time.perf_counter() - start:.0f}s")
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, rows, cols, engine.encode(), len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    os.replace(tmp, path)
+    return len(records)
+
+
+class OpeningBook:
+    # Read-only view of a book file. The file is memory-mapped, so any
+    # number of processes share one copy through the page cache.
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.rows, self.cols, engine, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not an opening book")
+        self.engine = engine.rstrip(b'\0').decode()
+        self.hits = 0
+        self.misses = 0
+
+    def find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = RECORD.unpack_from(self.data, HEADER.size + mid * RECORD.size)
+            if record[0] < key:
+                lo = mid + 1
+            elif record[0] > key:
+                hi = mid
+            else:
+                return record
+        return None
+
+    def lookup(self, pos):
+        # Returns (column, score) for the side to move, or None.
+        if (pos.rows, pos.cols) != (self.rows, self.cols) or pos.connect != CONNECT:
+            return None
+        key, mirrored = pos.canonical_key()
+        record = self.find(key)
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, score, col = record
+        return (self.cols - 1 - col if mirrored else col), score
+
+    def close(self):
+        self.data.close()
+
+
+def load_book(path):
+    # Scripts run fine without a book; it only replaces the search when the
+    # file has been built.
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a Connect 4 opening book")
+    parser.add_argument('path')
+    parser.add_argument('--plies', type=int, default=4)
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='weighted')
+    args = parser.parse_args()
+    count = build_book(args.path, args.plies, args.depth, args.engine)
+    print(f"Wrote {count} positions to {args.path}")
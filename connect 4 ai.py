@@ -56,7 +56,7 @@ def check_win(board, piece):
 
 def computer_move(board, computer_piece, human_piece):
     # First check for winning move
-    for col in range(7):
+    for col in range(len(board[0])):
         if is_valid_column(board, col):
             row = get_next_open_row(board, col)
             temp_board = [row.copy() for row in board]
@@ -65,7 +65,7 @@ def computer_move(board, computer_piece, human_piece):
                 return col
 
     # Block human's winning move
-    for col in range(7):
+    for col in range(len(board[0])):
         if is_valid_column(board, col):
             row = get_next_open_row(board, col)
             temp_board = [row.copy() for row in board]
@@ -74,7 +74,7 @@ def computer_move(board, computer_piece, human_piece):
                 return col
 
     # Choose random valid column
-    valid_cols = [c for c in range(7) if is_valid_column(board, c)]
+    valid_cols = [c for c in range(len(board[0])) if is_valid_column(board, c)]
     return random.choice(valid_cols)
 
 
@@ -0,0 +1,166 @@
+from bitboard import ROWS, COLS, CONNECT, Position
+
+_tables = {}
+
+
+def tables(rows=ROWS, cols=COLS, connect=CONNECT):
+    # Every `connect`-cell window of the grid as a bitboard mask, the mask
+    # of the center column, and for every cell the indexes of the windows
+    # through it, built once per geometry.
+    key = (rows, cols, connect)
+    if key not in _tables:
+        h1 = rows + 1
+        n = connect
+
+        def cells(c, r, dc, dr):
+            return [(c + i * dc) * h1 + r + i * dr for i in range(n)]
+
+        lines = []
+        for r in range(rows):
+            for c in range(cols - n + 1):
+                lines.append(cells(c, r, 1, 0))
+        for c in range(cols):
+            for r in range(rows - n + 1):
+                lines.append(cells(c, r, 0, 1))
+        for r in range(rows - n + 1):
+            for c in range(cols - n + 1):
+                lines.append(cells(c, r, 1, 1))
+        for r in range(n - 1, rows):
+            for c in range(cols - n + 1):
+                lines.append(cells(c, r, 1, -1))
+
+        windows = [sum(1 << i for i in line) for line in lines]
+        cell_windows = [[] for _ in range(cols * h1)]
+        for w, line in enumerate(lines):
+            for i in line:
+                cell_windows[i].append(w)
+        center = sum(1 << ((cols // 2) * h1 + r) for r in range(rows))
+        _tables[key] = (windows, center, cell_windows)
+    return _tables[key]
+
+
+class Evaluation:
+    # Sum of a per-window score, looked up by (own pieces, opponent pieces)
+    # in the window, plus a bonus per own piece in the center column.
+    def __init__(self, window_score, center_weight):
+        self.window_score = window_score
+        self.center_weight = center_weight
+        self._scores = {}
+
+    def scores(self, size=CONNECT):
+        # The window score table for windows of `size` cells.
+        if size not in self._scores:
+            self._scores[size] = [[self.window_score(m, t, size) if m + t <= size else 0 for t in range(size + 1)]
+                                  for m in range(size + 1)]
+        return self._scores[size]
+
+    def __call__(self, pos, player):
+        if isinstance(pos, EvalPosition) and pos.evaluation is self:
+            return pos.score[player]
+        windows, center, _ = tables(pos.rows, pos.cols, pos.connect)
+        me, opp = pos.boards[player], pos.boards[player ^ 1]
+        scores = self.scores(pos.connect)
+        score = (me & center).bit_count() * self.center_weight
+        for w in windows:
+            score += scores[(me & w).bit_count()][(opp & w).bit_count()]
+        return score
+
+    def symmetric(self, cols):
+        # Whether a position and its mirror image always score the same:
+        # the center bonus breaks the symmetry on boards with an even
+        # number of columns.
+        return cols % 2 == 1 or not self.center_weight
+
+    def position(self, pos):
+        if isinstance(pos, EvalPosition) and pos.evaluation is self:
+            return pos
+        return EvalPosition(pos, self)
+
+
+class EvalPosition(Position):
+    # A Position that keeps the piece count of both players in every window
+    # and both players' scores up to date as stones are played and taken
+    # back, so only the windows through the changed cell are touched.
+    def __init__(self, pos, evaluation):
+        super().__init__(pos.rows, pos.cols, pos.connect)
+        self.boards = pos.boards[:]
+        self.mirror = pos.mirror[:]
+        self.height = pos.height[:]
+        self.turn = pos.turn
+        self.moves = pos.moves
+        self.evaluation = evaluation
+        windows, center, self.cell_windows = tables(pos.rows, pos.cols, pos.connect)
+        self.scores = evaluation.scores(pos.connect)
+        self.center = center
+        self.counts = [[(b & w).bit_count() for w in windows] for b in self.boards]
+        self.score = [evaluation(pos, 0), evaluation(pos, 1)]
+
+    def copy(self):
+        pos = Position.copy(self)
+        pos.__class__ = EvalPosition
+        pos.evaluation = self.evaluation
+        pos.cell_windows = self.cell_windows
+        pos.scores = self.scores
+        pos.center = self.center
+        pos.counts = [self.counts[0][:], self.counts[1][:]]
+        pos.score = self.score[:]
+        return pos
+
+    def play(self, col):
+        i = self.height[col]
+        p = self.turn
+        mine, theirs = self.counts[p], self.counts[p ^ 1]
+        scores = self.scores
+        gain = loss = 0
+        for w in self.cell_windows[i]:
+            m, t = mine[w], theirs[w]
+            gain += scores[m + 1][t] - scores[m][t]
+            loss += scores[t][m + 1] - scores[t][m]
+            mine[w] = m + 1
+        if self.center >> i & 1:
+            gain += self.evaluation.center_weight
+        self.score[p] += gain
+        self.score[p ^ 1] += loss
+        Position.play(self, col)
+
+    def unplay(self, col):
+        Position.unplay(self, col)
+        i = self.height[col]
+        p = self.turn
+        mine, theirs = self.counts[p], self.counts[p ^ 1]
+        scores = self.scores
+        gain = loss = 0
+        for w in self.cell_windows[i]:
+            m, t = mine[w] - 1, theirs[w]
+            gain += scores[m + 1][t] - scores[m][t]
+            loss += scores[t][m + 1] - scores[t][m]
+            mine[w] = m
+        if self.center >> i & 1:
+            gain += self.evaluation.center_weight
+        self.score[p] -= gain
+        self.score[p ^ 1] -= loss
+
+
+def _weighted_window(mine, theirs, size):
+    return mine * 10 - theirs * 8
+
+
+def _threat_window(mine, theirs, size):
+    empty = size - mine - theirs
+    score = 0
+    if mine == size:
+        score += 100
+    elif mine == size - 1 and empty == 1:
+        score += 5
+    elif mine == size - 2 and empty == 2:
+        score += 2
+    if theirs == size - 1 and empty == 1:
+        score -= 4
+    return score
+
+
+# Scoring of the search in `Connect 4 Hardest AI.py`.
+evaluate_weighted = Evaluation(_weighted_window, 3)
+
+# Scoring of the search in the V2 UI.
+evaluate_threats = Evaluation(_threat_window, 3)
@@ -0,0 +1,142 @@
+import math
+import time
+
+import numpy as np
+
+from batch import aligned, bitboard_dtype
+from bitboard import Position
+
+
+class Node:
+    # `wins` counts the playouts won by the player who made the move into
+    # this node, a draw counting one half.
+    __slots__ = ('children', 'untried', 'visits', 'wins', 'terminal')
+
+    def __init__(self, moves):
+        self.children = {}
+        self.untried = moves
+        self.visits = 0
+        self.wins = 0.0
+        self.terminal = None
+
+    def select(self, c):
+        log_visits = math.log(self.visits)
+        best, best_col = -1.0, None
+        for col, child in self.children.items():
+            score = child.wins / child.visits + c * math.sqrt(log_visits / child.visits)
+            if score > best:
+                best, best_col = score, col
+        return best_col
+
+
+class MCTS:
+    # UCT search. Every expanded node is scored with `batch` random
+    # playouts run side by side on arrays of bitboards, so one tree
+    # iteration costs a few dozen NumPy calls however large the batch is;
+    # see batch.bitboard_dtype for boards too wide for uint64. Stops after
+    # `iterations` tree iterations or `movetime_ms`, whichever comes first.
+    def __init__(self, iterations=200, movetime_ms=None, batch=64, c=1.4, seed=None):
+        self.iterations = iterations
+        self.movetime_ms = movetime_ms
+        self.batch = batch
+        self.c = c
+        self.rng = np.random.default_rng(seed)
+        self.playouts = 0
+
+    def rollouts(self, pos, n):
+        # Sum over `n` random games from `pos` of the result for the side to
+        # move: 1 for a win, 0.5 for a draw and 0 for a loss.
+        dtype = bitboard_dtype(pos.rows, pos.cols)
+        one = np.ones(1, dtype=dtype)[0]
+        stones = [np.full(n, pos.boards[pos.turn], dtype=dtype),
+                  np.full(n, pos.boards[pos.turn ^ 1], dtype=dtype)]
+        height = np.tile(np.array(pos.height, dtype=dtype), (n, 1))
+        top = np.array(pos.top, dtype=dtype)
+        result = np.full(n, 0.5)
+        active = np.arange(n)
+        for ply in range(pos.rows * pos.cols - pos.moves):
+            if not active.size:
+                break
+            side = ply & 1
+            h = height[active]
+            col = (self.rng.random(h.shape) + (h < top)).argmax(axis=1)
+            rows = np.arange(active.size)
+            stones[side][active] |= one << h[rows, col]
+            height[active, col] += one
+            won = aligned(stones[side][active], pos.h1, pos.connect)
+            result[active[won]] = 1.0 - side
+            active = active[~won]
+        self.playouts += n
+        return result.sum()
+
+    def best_move(self, pos, iterations=None, movetime_ms=None):
+        # (column, share of playouts won through it) for the side to move.
+        valid_moves = pos.valid_moves()
+        if not valid_moves:
+            return None, 0.0
+        for col in valid_moves:
+            if pos.is_winning_move(col):
+                return col, 1.0
+
+        iterations = iterations or self.iterations
+        movetime_ms = movetime_ms or self.movetime_ms
+        deadline = time.perf_counter() + movetime_ms / 1000 if movetime_ms else None
+        pos = pos.copy()
+        root = Node(valid_moves)
+        self.playouts = 0
+        # The first iteration always runs, so the root has a child to pick.
+        for i in range(max(iterations, 1)):
+            if i and deadline is not None and time.perf_counter() > deadline:
+                break
+            self.iterate(root, pos)
+
+        col = max(root.children, key=lambda c: root.children[c].visits)
+        child = root.children[col]
+        return col, child.wins / child.visits
+
+    def iterate(self, root, pos):
+        node, path, played = root, [root], []
+
+        # Selection
+        while not node.untried and node.children and node.terminal is None:
+            col = node.select(self.c)
+            pos.play(col)
+            played.append(col)
+            node = node.children[col]
+            path.append(node)
+
+        # Expansion
+        n = self.batch
+        if node.terminal is None and node.untried:
+            col = node.untried.pop(self.rng.integers(len(node.untried)))
+            won = pos.is_winning_move(col)
+            pos.play(col)
+            played.append(col)
+            child = Node(pos.valid_moves())
+            if won:
+                child.terminal = 1.0
+            elif pos.is_full():
+                child.terminal = 0.5
+            node.children[col] = child
+            node = child
+            path.append(node)
+
+        # Simulation, scored for the player who moved into `node`
+        if node.terminal is not None:
+            wins = node.terminal * n
+        else:
+            wins = n - self.rollouts(pos, n)
+
+        # Backpropagation
+        for node in reversed(path):
+            node.visits += n
+            node.wins += wins
+            wins = n - wins
+        for col in reversed(played):
+            pos.unplay(col)
+
+
+def computer_move(board, computer_piece, human_piece, iterations=200, movetime_ms=None, seed=None):
+    pos = Position.from_board(board, computer_piece, human_piece)
+    col, _ = MCTS(iterations, movetime_ms, seed=seed).best_move(pos)
+    return col
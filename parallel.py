@@ -0,0 +1,77 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from positiondb import PositionDB
+from search import Search
+
+_worker = None
+
+
+def _init_worker(evaluate, win_score, db_settings):
+    global _worker
+    db = PositionDB(*db_settings) if db_settings is not None else None
+    _worker = Search(evaluate, win_score, endgame_cells=0, db=db)
+
+
+def _score_move(pos, col, depth, alpha, beta):
+    return _worker.score_move(pos, col, depth, alpha, beta)
+
+
+class ParallelSearch:
+    # Splits the root across a process pool. A serial search two plies
+    # shallower picks the principal move and guesses its score; the move is
+    # then searched here while every other root move is tested against the
+    # guess with a null window in its own task. Most tests fail low and are
+    # done; the moves they leave open are searched again above the true
+    # score. Scores are integers, so a move that comes before the principal
+    # move in the serial search's root order is compared one below the
+    # score: it wins a tie, as it would in Search.best_move, and the chosen
+    # move is the one that picks at the same depth. Each worker keeps its
+    # own transposition table between calls; with a position database they
+    # also share results through it.
+    def __init__(self, evaluate, win_score, workers=None, book=None, endgame_cells=16, db=None):
+        self.search = Search(evaluate, win_score, book=book, endgame_cells=endgame_cells, db=db)
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                            initargs=(evaluate, win_score, db.settings() if db is not None else None))
+
+    def best_move(self, pos, depth):
+        search = self.search
+        hit = search.immediate(pos)
+        if hit is None:
+            hit = search.lookup(pos)
+        if hit is not None:
+            return hit
+
+        order = sorted(pos.valid_moves(), key=lambda c: abs(2 * c - pos.cols + 1))
+        column, guess = order[0], 0
+        if depth > 2:
+            column, guess = search.search_root(pos, depth - 2)
+        tests = [(col, self.executor.submit(_score_move, pos, col, depth, guess, guess + 1))
+                 for col in order if col != column]
+        value = search.score_move(pos, column, depth)
+
+        # A failed-low test is an upper bound, a failed-high one a lower bound.
+        again = []
+        for col, test in tests:
+            target = value - 1 if order.index(col) < order.index(column) else value
+            score = test.result()
+            if score > guess or score > target:
+                again.append((col, target, self.executor.submit(_score_move, pos, col, depth, target, math.inf)))
+        scores = {column: value}
+        for col, target, future in again:
+            score = future.result()
+            if score > target:
+                scores[col] = score
+        best = max(scores, key=lambda c: (scores[c], -order.index(c)))
+        return best, scores[best]
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,137 @@
+import hashlib
+import sqlite3
+import threading
+
+from bitboard import ROWS, COLS, CONNECT
+
+# Search results that outlive the process: a SQLite file in WAL mode, so
+# any number of processes can read it while one of them writes. Keys are
+# Search.table_key() values, which already fold mirror images together,
+# stored per namespace, which is derived from the board geometry and the
+# evaluation's window scores, center weight and win score: changing any
+# of them starts a fresh namespace instead of reusing stale scores. Only
+# results searched at least `min_depth` deep are worth a disk round trip;
+# writes are buffered and committed `batch` at a time, and past
+# `max_entries` the shallowest entries are dropped.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    namespace TEXT NOT NULL,
+    key BLOB NOT NULL,
+    depth INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    flag INTEGER NOT NULL,
+    move INTEGER,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS positions_depth ON positions (namespace, depth);
+"""
+
+
+def _blob(key):
+    return key.to_bytes((key.bit_length() + 7) // 8 or 1, 'little')
+
+
+def namespace(evaluate, win_score, rows=ROWS, cols=COLS, connect=CONNECT):
+    digest = hashlib.sha1(repr((evaluate.scores(connect), evaluate.center_weight, win_score)).encode())
+    return f"{digest.hexdigest()[:16]}/{rows}x{cols}/{connect}"
+
+
+class PositionDB:
+    def __init__(self, path, evaluate, win_score, rows=ROWS, cols=COLS, connect=CONNECT, min_depth=3, batch=1000,
+                 max_entries=2000000):
+        self.path = path
+        self.evaluate = evaluate
+        self.win_score = win_score
+        self.geometry = (rows, cols, connect)
+        self.namespace = namespace(evaluate, win_score, rows, cols, connect)
+        self.min_depth = min_depth
+        self.batch = batch
+        self.max_entries = max_entries
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # The searches of the UIs run on worker threads, one at a time.
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        # An upper bound on the rows of the namespace: every flushed entry
+        # counts as new, so the table is only counted for real once this
+        # passes the cap.
+        self.entries = self._count()
+
+    def _count(self):
+        return self.conn.execute('SELECT count(*) FROM positions WHERE namespace = ?',
+                                 (self.namespace,)).fetchone()[0]
+
+    def settings(self):
+        # Arguments that open the same database again. A connection must
+        # not cross a fork, so worker processes open their own from these.
+        return ((self.path, self.evaluate, self.win_score) + self.geometry
+                + (self.min_depth, self.batch, self.max_entries))
+
+    def get(self, key):
+        # (depth, score, flag, move) stored for `key`, or None.
+        entry = self.pending.get(key)
+        if entry is not None:
+            return entry
+        with self.lock:
+            row = self.conn.execute('SELECT depth, score, flag, move FROM positions WHERE namespace = ? AND key = ?',
+                                    (self.namespace, _blob(key))).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def put(self, key, depth, score, flag, move):
+        if depth < self.min_depth:
+            return
+        old = self.pending.get(key)
+        if old is None or old[0] <= depth:
+            self.pending[key] = (depth, score, flag, move)
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows = [(self.namespace, _blob(key)) + entry for key, entry in self.pending.items()]
+        self.pending = {}
+        with self.lock, self.conn:
+            # A deeper result already on disk, perhaps from another
+            # process, is kept.
+            self.conn.executemany(
+                'INSERT INTO positions (namespace, key, depth, score, flag, move) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (namespace, key) DO UPDATE SET depth = excluded.depth, score = excluded.score, '
+                'flag = excluded.flag, move = excluded.move WHERE excluded.depth >= positions.depth', rows)
+            self.entries += len(rows)
+            if self.entries <= self.max_entries:
+                return
+            self.entries = self._count()
+            if self.entries > self.max_entries:
+                # Evict down to 90% of the cap so this does not run on every
+                # flush.
+                self.conn.execute(
+                    'DELETE FROM positions WHERE namespace = ? AND key IN (SELECT key FROM positions '
+                    'WHERE namespace = ? ORDER BY depth LIMIT ?)',
+                    (self.namespace, self.namespace, self.entries - self.max_entries * 9 // 10))
+                self.entries = self.max_entries * 9 // 10
+
+    def __len__(self):
+        with self.lock:
+            return self._count() + len(self.pending)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def open_db(path, evaluate, win_score, **options):
+    # Like load_book, but the file is created on first use: an unwritable
+    # location just means running without a database.
+    try:
+        return PositionDB(path, evaluate, win_score, **options)
+    except sqlite3.Error:
+        return None
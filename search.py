@@ -0,0 +1,381 @@
+import math
+import time
+
+from solver import Solver, outcome
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Search:
+    # Negamax with alpha-beta. Scores are from the point of view of the side
+    # to move; `evaluate` always scores for the side that was to move at the
+    # root, so the table key records whether that side is to move too. When
+    # the evaluation scores mirror images alike, a position and its mirror
+    # share one table entry, keyed by the smaller of the two keys.
+    def __init__(self, evaluate, win_score, tt=None, book=None, endgame_cells=16, stats=None, db=None):
+        self.evaluate = evaluate
+        self.win_score = win_score
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.book = book
+        self.endgame_cells = endgame_cells
+        self.stats = stats
+        # An optional positiondb.PositionDB behind the transposition table.
+        self.db = db
+        self.use_db = False
+        self.solver = None
+        self.solution = None
+        self.root_done = 0
+        self.root_total = 0
+        self.started = None
+        self.budget = None
+        self.stop_requested = False
+        self.player = 0
+        self.geometry = None
+        self.symmetric = False
+        self.nodes = 0
+        self.depth = 0
+        self.deadline = None
+        self.pv = []
+        self.follow_pv = False
+        self.center_order = None
+        self.killers = []
+        self.history = [[], []]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self, pos):
+        # Per-move state: counters, killer moves per ply and the history
+        # table, indexed by (root side to move or not, cell) of the move.
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        geometry = (pos.rows, pos.cols, pos.connect)
+        if geometry != self.geometry:
+            # Keys only identify a position on one board size, and scores
+            # depend on the connect length: entries of another geometry
+            # must not be found.
+            if self.geometry is not None:
+                self.tt.clear()
+            self.geometry = geometry
+        symmetric = getattr(self.evaluate, 'symmetric', None)
+        self.symmetric = symmetric is not None and symmetric(pos.cols)
+        self.use_db = self.db is not None and self.db.geometry == geometry
+        if self.center_order is None or len(self.center_order) != pos.cols:
+            self.center_order = sorted(range(pos.cols), key=lambda c: abs(2 * c - pos.cols + 1))
+        self.killers = [[None, None] for _ in range(pos.rows * pos.cols + 1)]
+        cells = pos.cols * pos.h1
+        self.history = [[0] * cells, [0] * cells]
+
+    def lookup(self, pos):
+        # Book moves in the opening and exact solving once fewer than
+        # `endgame_cells` cells are empty replace the heuristic search. A
+        # solved position leaves its ('win' | 'draw' | 'loss', plies) result
+        # in `solution`.
+        self.solution = None
+        stats = self.stats
+        if stats is not None:
+            stats.reset()
+        if not pos.valid_moves():
+            # A full board: nothing to look up, and the solver has no move.
+            return None
+        if self.book is not None:
+            hit = self.book.lookup(pos)
+            if hit is not None:
+                if stats is not None:
+                    stats.lookup('book')
+                return hit
+        if pos.rows * pos.cols - pos.moves < self.endgame_cells:
+            if self.solver is None:
+                self.solver = Solver()
+            col, score = self.solver.best_move(pos)
+            self.solution = outcome(pos, score)
+            if stats is not None:
+                stats.lookup('solver')
+            if score > 0:
+                return col, self.win_score
+            if score < 0:
+                return col, -self.win_score
+            return col, 0
+        return None
+
+    def prepare(self, pos):
+        # Evaluations that can follow play/unplay incrementally supply their
+        # own Position type; plain evaluation functions score from scratch.
+        position = getattr(self.evaluate, 'position', None)
+        return position(pos) if position is not None else pos
+
+    def stop(self):
+        # Asks a search running on another thread with a deadline to give up
+        # at its next deadline check.
+        self.stop_requested = True
+
+    def progress(self):
+        # Rough completion of the running search in [0, 1]: the share of the
+        # time budget used, or of root moves searched at a fixed depth.
+        if self.budget:
+            return min(1.0, (time.perf_counter() - self.started) / self.budget)
+        if self.root_total:
+            return self.root_done / self.root_total
+        return 0.0
+
+    def table_key(self, pos, player):
+        # Transposition table key of `pos` and whether it is the mirror
+        # image's, in which case moves are stored mirrored too.
+        key = pos.key()
+        if self.symmetric:
+            mirror = pos.mirror_key()
+            if mirror < key:
+                return mirror << 1 | (pos.turn ^ player), True
+        return key << 1 | (pos.turn ^ player), False
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def order_moves(self, pos, ply, tt_move=None):
+        history = self.history[pos.turn ^ self.player]
+        height = pos.height
+        moves = [c for c in self.center_order if pos.can_play(c)]
+        moves.sort(key=lambda c: -history[height[c]])
+        for first in reversed(self.killers[ply]):
+            if first is not None and first in moves:
+                moves.remove(first)
+                moves.insert(0, first)
+        if tt_move is not None and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        # While still on the previous iteration's principal variation, try
+        # its move first so the new iteration starts from the best line.
+        if self.follow_pv:
+            if ply < len(self.pv) and self.pv[ply] in moves:
+                moves.remove(self.pv[ply])
+                moves.insert(0, self.pv[ply])
+            else:
+                self.follow_pv = False
+        return moves
+
+    def record_cutoff(self, pos, col, index, depth, ply):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if self.stats is not None:
+            self.stats.current['cutoffs'][index] += 1
+        killers = self.killers[ply]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[pos.turn ^ self.player][pos.height[col]] += depth * depth
+
+    def negamax(self, pos, depth, alpha, beta, ply=1):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 1023:
+            if self.stop_requested or time.perf_counter() > self.deadline:
+                raise SearchTimeout
+        stats = self.stats
+        if stats is not None:
+            stats.current['nodes'][ply] += 1
+        if depth == 0 or pos.is_full():
+            if stats is not None:
+                stats.current['evaluations'] += 1
+            score = self.evaluate(pos, self.player)
+            return score if pos.turn == self.player else -score
+
+        for col in self.center_order:
+            if pos.can_play(col) and pos.is_winning_move(col):
+                if stats is not None:
+                    stats.current['terminals'] += 1
+                return self.win_score
+
+        alpha_orig = alpha
+        key, mirrored = self.table_key(pos, self.player)
+        entry = self.tt.get(key)
+        if entry is None and self.use_db and depth >= self.db.min_depth:
+            entry = self.db.get(key)
+            if entry is not None:
+                self.tt.put(key, *entry)
+        tt_move = None
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if mirrored and tt_move is not None:
+                tt_move = pos.cols - 1 - tt_move
+            if tt_depth >= depth:
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWER:
+                    alpha = max(alpha, tt_score)
+                else:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score
+
+        value, column = -math.inf, None
+        for i, col in enumerate(self.order_moves(pos, ply, tt_move)):
+            pos.play(col)
+            score = -self.negamax(pos, depth - 1, -beta, -alpha, ply + 1)
+            pos.unplay(col)
+            self.follow_pv = False
+            if score > value:
+                value = score
+                column = col
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.record_cutoff(pos, col, i, depth, ply)
+                break
+
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if mirrored and column is not None:
+            column = pos.cols - 1 - column
+        self.tt.put(key, depth, value, flag, column)
+        if self.use_db and depth >= self.db.min_depth:
+            self.db.put(key, depth, value, flag, column)
+        return value
+
+    def immediate(self, pos):
+        # The result of a position decided without searching: no move left,
+        # or a move that wins at once. None otherwise.
+        valid_moves = pos.valid_moves()
+        hit = None
+        if not valid_moves:
+            hit = None, 0
+        for col in valid_moves:
+            if pos.is_winning_move(col):
+                hit = col, self.win_score
+                break
+        if hit is not None and self.stats is not None:
+            self.stats.reset()
+            self.stats.lookup('immediate')
+        return hit
+
+    def best_move(self, pos, depth, pv=None):
+        # A call without `pv` starts a new search; iterative deepening passes
+        # the previous iteration's line and keeps killers and history.
+        hit = self.immediate(pos)
+        if hit is None and pv is None:
+            hit = self.lookup(pos)
+        if hit is not None:
+            return hit
+        return self.search_root(pos, depth, pv)
+
+    def search_root(self, pos, depth, pv=None):
+        # One alpha-beta search of `pos`, which has a move and no immediate
+        # win, without the book or the solver. A new search when `pv` is
+        # None, else a continuation along that line.
+        pos = self.prepare(pos)
+        self.player = pos.turn
+        if pv is None:
+            self.new_search(pos)
+            pv = []
+        self.pv = list(pv)
+        self.follow_pv = bool(self.pv)
+
+        depth = max(depth, 1)
+        stats = self.stats
+        if stats is not None:
+            stats.begin(depth, pos, self.tt)
+            stats.current['nodes'][0] += 1
+        column, value = None, -math.inf
+        alpha = -math.inf
+        moves = self.order_moves(pos, 0)
+        self.root_done, self.root_total = 0, len(moves)
+        for col in moves:
+            pos.play(col)
+            score = -self.negamax(pos, depth - 1, -math.inf, -alpha)
+            pos.unplay(col)
+            self.follow_pv = False
+            self.root_done += 1
+            if score > value:
+                value = score
+                column = col
+            alpha = max(alpha, value)
+        if stats is not None:
+            stats.end(self.tt, column, value)
+        if self.use_db:
+            self.db.flush()
+        return column, value
+
+    def score_move(self, pos, col, depth, alpha=-math.inf, beta=math.inf):
+        # Score of one root move, as searched by best_move, within (alpha,
+        # beta): full-window by default. Used to search root moves
+        # independently of each other.
+        pos = self.prepare(pos.copy())
+        self.player = pos.turn
+        self.new_search(pos)
+        self.pv = []
+        self.follow_pv = False
+        if pos.is_winning_move(col):
+            return self.win_score
+        pos.play(col)
+        score = -self.negamax(pos, max(depth, 1) - 1, -beta, -alpha)
+        if self.use_db:
+            self.db.flush()
+        return score
+
+    def principal_variation(self, pos, col, depth):
+        pv = [col]
+        player = pos.turn
+        pos = pos.copy()
+        pos.play(col)
+        while len(pv) < depth:
+            key, mirrored = self.table_key(pos, player)
+            entry = self.tt.peek(key)
+            if entry is None or entry[3] is None:
+                break
+            move = pos.cols - 1 - entry[3] if mirrored else entry[3]
+            if not pos.can_play(move):
+                break
+            pv.append(move)
+            pos.play(move)
+        return pv
+
+    def iterative_deepening(self, pos, movetime_ms, max_depth=None):
+        # Searches depth 1, 2, 3... until `movetime_ms` is spent and returns
+        # the result of the last iteration that completed. Depth 1 always
+        # runs to completion.
+        hit = self.immediate(pos)
+        if hit is None:
+            hit = self.lookup(pos)
+        if hit is not None:
+            return hit
+
+        start = time.perf_counter()
+        deadline = start + movetime_ms / 1000
+        self.started, self.budget = start, movetime_ms / 1000
+        self.stop_requested = False
+        # A timeout unwinds the search without undoing its moves, so the
+        # iterations run on a private copy.
+        pos = self.prepare(pos.copy())
+        if max_depth is None:
+            max_depth = pos.rows * pos.cols - pos.moves
+        column, value = self.search_root(pos, 1)
+        pv = [column] if column is not None else []
+        self.depth = 1
+        try:
+            for depth in range(2, max_depth + 1):
+                if abs(value) >= self.win_score:
+                    break
+                now = time.perf_counter()
+                # The next iteration costs at least as much as the last one.
+                if now + (now - start) > deadline:
+                    break
+                self.deadline = deadline
+                column, value = self.search_root(pos, depth, pv)
+                pv = self.principal_variation(pos, column, depth)
+                self.depth = depth
+        except SearchTimeout:
+            if self.stats is not None:
+                self.stats.current = None
+        finally:
+            self.deadline = None
+            self.budget = None
+            if self.use_db:
+                self.db.flush()
+        return column, value
+
@@ -0,0 +1,132 @@
+import argparse
+import importlib.util
+import os
+import random
+import resource
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from bitboard import Position
+from search import Search
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_ui():
+    spec = importlib.util.spec_from_file_location('ui_v2', os.path.join(HERE, 'Connect 4 AI Hard UI V2.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def rss_mb():
+    # Current resident set size where /proc is available, else the peak.
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class Human:
+    # Stands in for the player at the mouse: whenever play() is about to
+    # wait for input on the human's turn, it picks a column (at random for
+    # the first `random_plies` moves of the game, then with its own search)
+    # and queues the mouse motion and click the UI would receive.
+    def __init__(self, ui, session, depth, random_plies, think_ms, rng):
+        self.ui = ui
+        self.session = session
+        self.depth = depth
+        self.random_plies = random_plies
+        self.think_ms = think_ms
+        self.rng = rng
+        self.search = Search(ui.engine.evaluate, ui.engine.win_score)
+        self.mouse = (0, 0)
+        self.wait_events = ui.wait_events
+        ui.wait_events = self.events
+        ui.pygame.mouse.get_pos = lambda: self.mouse
+
+    def events(self, timeout=0):
+        session = self.session
+        if session.state == self.ui.PLAYING and session.human_turn:
+            # Leave the ponder thread some of the human's time.
+            time.sleep(self.think_ms / 1000)
+            self.click(self.choose(session.board))
+        return self.wait_events(timeout)
+
+    def choose(self, board):
+        moves = sum(cell is not None for row in board for cell in row)
+        if moves < self.random_plies:
+            return self.rng.choice([c for c in range(len(board[0])) if self.ui.is_valid_move(board, c)])
+        col, _ = self.search.best_move(Position.from_board(board, 'YELLOW', 'RED'), self.depth)
+        return col
+
+    def click(self, col):
+        ui = self.ui
+        x = (ui.WIDTH - 7 * ui.SQUARE_SIZE) // 2 + col * ui.SQUARE_SIZE + ui.SQUARE_SIZE // 2
+        self.mouse = (x, ui.SQUARE_SIZE // 2)
+        pygame = ui.pygame
+        pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=self.mouse, rel=(0, 0), buttons=(0, 0, 0)))
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=self.mouse, button=1))
+
+
+def play_game(ui, session, human):
+    # One Human vs AI game through play(), the frame loop the UI runs, with
+    # the AI searching AI_DEPTH deep on its worker thread and pondering on
+    # the human's time. Both transposition tables start empty so memory
+    # is compared between games at the same point of filling them.
+    ui.engine.tt.clear()
+    human.search.tt.clear()
+    session.start(2)
+    ui.play(session)
+    result = session.result
+    session.acknowledge()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play many headless games through the V2 UI and watch memory")
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--human-depth', type=int, default=2, help="search depth of the simulated human")
+    parser.add_argument('--random-plies', type=int, default=4)
+    parser.add_argument('--think-ms', type=int, default=20, help="time the simulated human takes per move")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=30, help="games played before the baseline is taken")
+    parser.add_argument('--max-growth-mb', type=float, default=20.0)
+    args = parser.parse_args()
+
+    ui = load_ui()
+    # Pieces land at once, and games never touch the position database.
+    ui.DROP_MS = 1
+    ui.SETTLE_MS = 0
+    ui.engine.db = None
+    rng = random.Random(args.seed)
+    session = ui.Session()
+    human = Human(ui, session, args.human_depth, args.random_plies, args.think_ms, rng)
+    results = {}
+    baseline = None
+    start = time.perf_counter()
+    for game in range(1, args.games + 1):
+        result = play_game(ui, session, human)
+        results[result] = results.get(result, 0) + 1
+        if game == min(args.warmup, args.games):
+            baseline = rss_mb()
+        if game % 10 == 0 or game == args.games:
+            print(f"{game} games, {time.perf_counter() - start:.0f}s, rss {rss_mb():.1f} MB")
+
+    growth = rss_mb() - baseline
+    print(", ".join(f"{name}: {count}" for name, count in sorted(results.items())))
+    print(f"RSS growth after warmup: {growth:.1f} MB (limit {args.max_growth_mb} MB)")
+    if session.games != args.games:
+        print(f"Session counted {session.games} games, expected {args.games}")
+        return 1
+    return 1 if growth > args.max_growth_mb else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
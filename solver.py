@@ -0,0 +1,182 @@
+from transposition import LOWER, UPPER, TranspositionTable
+
+# Scores follow the usual Connect 4 solver convention: 0 is a draw, a
+# positive score means the side to move wins and is larger the sooner it
+# wins: (cells + 1 - moves) // 2 for a win with the next stone. A negative
+# score is a loss, smaller the sooner it comes.
+
+
+class Solver:
+    def __init__(self, tt=None):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.nodes = 0
+        self.geometry = None
+
+    def setup(self, pos):
+        if self.geometry == (pos.rows, pos.cols, pos.connect):
+            return
+        if self.geometry is not None:
+            # Table entries of another geometry would be misread.
+            self.tt.clear()
+        self.geometry = (pos.rows, pos.cols, pos.connect)
+        self.connect = pos.connect
+        h1 = pos.h1
+        self.bottom = sum(1 << (c * h1) for c in range(pos.cols))
+        self.board_mask = self.bottom * ((1 << pos.rows) - 1)
+        self.column_masks = [((1 << pos.rows) - 1) << (c * h1) for c in range(pos.cols)]
+        self.center_order = sorted(range(pos.cols), key=lambda c: abs(2 * c - pos.cols + 1))
+        self.cells = pos.rows * pos.cols
+        self.h1 = h1
+
+    def winning_cells(self, stones, mask):
+        # Empty cells that would complete four for `stones`.
+        h1 = self.h1
+        if self.connect != 4:
+            return self.winning_cells_n(stones, mask)
+        r = (stones << 1) & (stones << 2) & (stones << 3)
+        for shift in (h1, h1 - 1, h1 + 1):
+            p = (stones << shift) & (stones << 2 * shift)
+            r |= p & (stones << 3 * shift)
+            r |= p & (stones >> shift)
+            p = (stones >> shift) & (stones >> 2 * shift)
+            r |= p & (stones << shift)
+            r |= p & (stones >> 3 * shift)
+        return r & (self.board_mask ^ mask)
+
+    def winning_cells_n(self, stones, mask):
+        # winning_cells for any line length: a cell wins if, for some
+        # direction and some place j of the cell in a line of `connect`,
+        # the other cells of that line all hold stones.
+        n = self.connect
+        r = 0
+        for shift in (1, self.h1, self.h1 - 1, self.h1 + 1):
+            for j in range(n):
+                p = -1
+                for i in range(n):
+                    if i > j:
+                        p &= stones >> ((i - j) * shift)
+                    elif i < j:
+                        p &= stones << ((j - i) * shift)
+                r |= p
+        return r & (self.board_mask ^ mask)
+
+    def non_losing_moves(self, pos):
+        # Playable cells that do not hand the opponent an immediate win.
+        mask = pos.boards[0] | pos.boards[1]
+        possible = (mask + self.bottom) & self.board_mask
+        threats = self.winning_cells(pos.boards[pos.turn ^ 1], mask)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            possible = forced
+        return possible & ~(threats >> 1)
+
+    def negamax(self, pos, alpha, beta):
+        # Assumes the side to move has no immediate win.
+        self.nodes += 1
+        moves = self.non_losing_moves(pos)
+        if not moves:
+            return -((self.cells - pos.moves) // 2)
+        if pos.moves >= self.cells - 2:
+            return 0
+
+        low = -((self.cells - 2 - pos.moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        high = (self.cells - 1 - pos.moves) // 2
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        # Exact scores are the same for a position and its mirror image.
+        key = min(pos.key(), pos.mirror_key())
+        entry = self.tt.get(key)
+        if entry is not None:
+            _, score, flag, _ = entry
+            if flag == LOWER:
+                if alpha < score:
+                    alpha = score
+                    if alpha >= beta:
+                        return alpha
+            elif beta > score:
+                beta = score
+                if alpha >= beta:
+                    return beta
+
+        # Moves creating the most threats first, center first on ties.
+        mask = pos.boards[0] | pos.boards[1]
+        stones = pos.boards[pos.turn]
+        ordered = []
+        for col in self.center_order:
+            move = moves & self.column_masks[col]
+            if move:
+                ordered.append((-self.winning_cells(stones | move, mask | move).bit_count(), col))
+        ordered.sort()
+
+        for _, col in ordered:
+            pos.play(col)
+            score = -self.negamax(pos, -beta, -alpha)
+            pos.unplay(col)
+            if score >= beta:
+                self.tt.put(key, 0, score, LOWER, col)
+                return score
+            if score > alpha:
+                alpha = score
+        self.tt.put(key, 0, alpha, UPPER, None)
+        return alpha
+
+    def solve(self, pos):
+        # Exact score of `pos`, found with null-window probes that narrow
+        # the [min, max] interval around the true score.
+        self.setup(pos)
+        for col in self.center_order:
+            if pos.can_play(col) and pos.is_winning_move(col):
+                return (self.cells + 1 - pos.moves) // 2
+        low = -((self.cells - pos.moves) // 2)
+        high = (self.cells + 1 - pos.moves) // 2
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and int(low / 2) < med:
+                med = int(low / 2)
+            elif med >= 0 and int(high / 2) > med:
+                med = int(high / 2)
+            score = self.negamax(pos, med, med + 1)
+            if score <= med:
+                high = score
+            else:
+                low = score
+        return low
+
+    def best_move(self, pos):
+        # (column, score) of the best move for the side to move: the
+        # quickest win, else a draw, else the slowest loss.
+        self.setup(pos)
+        column, value = None, None
+        for col in self.center_order:
+            if not pos.can_play(col):
+                continue
+            if pos.is_winning_move(col):
+                return col, (self.cells + 1 - pos.moves) // 2
+            pos.play(col)
+            score = -self.solve(pos)
+            pos.unplay(col)
+            if value is None or score > value:
+                column, value = col, score
+        return column, value
+
+
+def outcome(pos, score):
+    # ('win' | 'draw' | 'loss', plies until the game ends) for the side to
+    # move, given an exact solver score.
+    cells = pos.rows * pos.cols
+    if score == 0:
+        return 'draw', cells - pos.moves
+    winner_moves = pos.moves if score > 0 else pos.moves + 1
+    last = cells + 1 - 2 * abs(score)
+    if last % 2 != winner_moves % 2:
+        last -= 1
+    return ('win' if score > 0 else 'loss'), last - pos.moves + 1
@@ -0,0 +1,92 @@
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SearchStats:
+    # Counters for one move's search, kept per iteration (one best_move
+    # call at a given depth). Attach it as `Search.stats` to collect them;
+    # with no stats object the search does no extra work. `on_depth` is
+    # called with each iteration's record as soon as that depth completes.
+    def __init__(self, on_depth=None):
+        self.on_depth = on_depth
+        self.iterations = []
+        self.source = None
+        self.current = None
+
+    def reset(self):
+        self.iterations = []
+        self.source = None
+        self.current = None
+
+    def begin(self, depth, pos, tt):
+        self.source = 'search'
+        self.current = {
+            'depth': depth,
+            'nodes': [0] * (pos.rows * pos.cols - pos.moves + 2),
+            'evaluations': 0,
+            'terminals': 0,
+            'cutoffs': [0] * pos.cols,
+            'tt_probes': tt.hits + tt.misses,
+            'tt_hits': tt.hits,
+            'started': time.perf_counter(),
+        }
+
+    def end(self, tt, column, value):
+        record = self.current
+        self.current = None
+        record['seconds'] = time.perf_counter() - record.pop('started')
+        record['tt_probes'] = tt.hits + tt.misses - record['tt_probes']
+        record['tt_hits'] = tt.hits - record['tt_hits']
+        while len(record['nodes']) > 1 and not record['nodes'][-1]:
+            record['nodes'].pop()
+        record['move'] = column
+        record['score'] = value
+        self.iterations.append(record)
+        if self.on_depth is not None:
+            self.on_depth(record)
+
+    def lookup(self, source):
+        # The move came from the book or the endgame solver, not a search.
+        self.source = source
+
+    def report(self):
+        nodes = sum(sum(r['nodes']) for r in self.iterations)
+        cutoffs = sum(sum(r['cutoffs']) for r in self.iterations)
+        first = sum(r['cutoffs'][0] for r in self.iterations)
+        probes = sum(r['tt_probes'] for r in self.iterations)
+        hits = sum(r['tt_hits'] for r in self.iterations)
+        seconds = sum(r['seconds'] for r in self.iterations)
+        last = self.iterations[-1] if self.iterations else {}
+        return {
+            'source': self.source,
+            'depth': last.get('depth', 0),
+            'move': last.get('move'),
+            'score': last.get('score'),
+            'nodes': nodes,
+            'evaluations': sum(r['evaluations'] for r in self.iterations),
+            'terminals': sum(r['terminals'] for r in self.iterations),
+            'cutoffs': cutoffs,
+            'first_move_cutoff_rate': first / cutoffs if cutoffs else 0.0,
+            'tt_probes': probes,
+            'tt_hit_rate': hits / probes if probes else 0.0,
+            'seconds': seconds,
+            'nps': nodes / seconds if seconds else 0.0,
+            'iterations': self.iterations,
+        }
+
+    def log_line(self):
+        # One JSON line with the totals and the nodes and time per depth.
+        report = self.report()
+        report['iterations'] = [{'depth': r['depth'], 'nodes': sum(r['nodes']), 'seconds': round(r['seconds'], 6)}
+                                for r in report['iterations']]
+        for key in ('first_move_cutoff_rate', 'tt_hit_rate', 'seconds', 'nps'):
+            report[key] = round(report[key], 6)
+        return json.dumps(report, separators=(',', ':'))
+
+    def log(self):
+        # Logs the line at INFO level, once per move, for games run with
+        # their statistics switched on.
+        logger.info(self.log_line())
@@ -0,0 +1,38 @@
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable:
+    # Fixed number of slots, indexed by key modulo the (prime) size. Each
+    # slot keeps the full key so that collisions are detected, and a new
+    # entry always replaces the old one.
+    def __init__(self, size=1000003):
+        self.size = size
+        self.keys = [None] * size
+        self.entries = [None] * size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        i = key % self.size
+        if self.keys[i] == key:
+            self.hits += 1
+            return self.entries[i]
+        self.misses += 1
+        return None
+
+    def peek(self, key):
+        i = key % self.size
+        return self.entries[i] if self.keys[i] == key else None
+
+    def put(self, key, depth, score, flag, move):
+        i = key % self.size
+        self.keys[i] = key
+        self.entries[i] = (depth, score, flag, move)
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
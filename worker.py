@@ -0,0 +1,97 @@
+import math
+import threading
+
+from search import SearchTimeout
+
+
+class SearchWorker:
+    # Runs one search on a background thread so that the caller's frame
+    # loop keeps running; poll ready() and then read `result`, the
+    # (column, score) pair of the search. `on_done` is called from the
+    # worker thread when the search ends.
+    def __init__(self, search, pos, depth=None, movetime_ms=None, on_done=None):
+        self.search = search
+        self.result = None
+        self.error = None
+        self.on_done = on_done
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(pos.copy(), depth, movetime_ms), daemon=True)
+        self._thread.start()
+
+    def _run(self, pos, depth, movetime_ms):
+        try:
+            if movetime_ms is not None:
+                self.result = self.search.iterative_deepening(pos, movetime_ms)
+            else:
+                self.result = self.search.best_move(pos, depth)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+            if self.on_done is not None:
+                self.on_done()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def progress(self):
+        return 1.0 if self.ready() else self.search.progress()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Ponder:
+    # Searches on the opponent's time. `pos` has the opponent to move; every
+    # reply is searched one depth at a time, the `predicted` one first,
+    # until stop() is called or every reply has been searched `max_depth`
+    # deep; without a limit that is the rest of the game. The results fill
+    # the search's transposition table, and `results` maps each reply
+    # column to the deepest (depth, (column, score)) answer found for it.
+    def __init__(self, search, pos, predicted=None, max_depth=None):
+        self.search = search
+        self.pos = pos.copy()
+        self.replies = [c for c in pos.valid_moves() if not pos.is_winning_move(c)]
+        if predicted in self.replies:
+            self.replies.remove(predicted)
+            self.replies.insert(0, predicted)
+        self.max_depth = max_depth or pos.rows * pos.cols - pos.moves
+        self.results = {}
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        search = self.search
+        search.stop_requested = False
+        search.deadline = math.inf
+        try:
+            for depth in range(1, self.max_depth + 1):
+                for col in self.replies:
+                    if self._stopped:
+                        return
+                    child = self.pos.copy()
+                    child.play(col)
+                    if child.is_full():
+                        continue
+                    self.results[col] = (depth, search.best_move(child, depth))
+        except SearchTimeout:
+            pass
+        finally:
+            search.deadline = None
+
+    def stop(self):
+        self._stopped = True
+        self.search.stop()
+        self._thread.join()
+
+    def result(self, col, depth):
+        # The pondered answer to reply `col` if it was searched at least
+        # `depth` deep, else None.
+        found = self.results.get(col)
+        if found is not None and found[0] >= depth:
+            return found[1]
+        return None